@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import click
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+STORE_DIR_NAME = 'parquet'
+MANIFEST_NAME = '_manifest.json'
+JSON_OBJECT = re.compile(r'{.*}')
+
+CLIENT_SCHEMA = pa.schema([
+    ('type', pa.dictionary(pa.int8(), pa.string())),
+    ('time', pa.int64()),
+    ('duration', pa.int64()),
+    ('total_duration', pa.int64()),
+    ('object', pa.string()),
+    ('version', pa.int64()),
+    ('cached', pa.bool_()),
+    ('bytes', pa.int64()),
+    ('not_modified', pa.bool_()),
+    ('connect', pa.int64()),
+    ('ttfb', pa.int64()),
+    ('transfer', pa.int64()),
+    ('decode', pa.int64()),
+    ('think', pa.int64()),
+    ('edge', pa.dictionary(pa.int8(), pa.string())),
+    ('attempts', pa.int8()),
+    ('event', pa.string()),
+    ('client', pa.int32()),
+    ('session', pa.int64()),
+    ('scheduled', pa.int64()),
+    ('lag', pa.int64()),
+])
+ORIGIN_SCHEMA = pa.schema([
+    ('type', pa.dictionary(pa.int8(), pa.string())),
+    ('time', pa.int64()),
+    ('object', pa.string()),
+    ('version', pa.int64()),
+])
+MININET_SCHEMA = pa.schema([
+    ('type', pa.dictionary(pa.int8(), pa.string())),
+    ('time', pa.int64()),
+    ('active_clients', pa.int32()),
+    ('file', pa.string()),
+    ('name', pa.string()),
+    ('pid', pa.int64()),
+    ('component', pa.string()),
+    ('latency', pa.int64()),
+    ('ready', pa.bool_()),
+    ('client', pa.int32()),
+    ('host', pa.string()),
+])
+INTERFACE_COUNTERS = ['bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout', 'dropin', 'dropout']
+INTERFACE_SCHEMA = pa.schema([('time', pa.int64()), ('nic', pa.string())] + [(counter, pa.int64()) for counter in INTERFACE_COUNTERS])
+LINK_COUNTERS = ['bytes_down', 'bytes_up', 'packets_down', 'packets_up']
+
+
+def json_records(file_path: Path, extract_json: bool = False) -> Iterator[dict]:
+    with file_path.open(errors='backslashreplace') as log_file:
+        for line in log_file:
+            if extract_json:
+                match = JSON_OBJECT.search(line)
+                if match is None:
+                    continue
+                line = match.group(0)
+            elif not line.startswith('{'):
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f'Skipping malformed line in {file_path}: {line.strip()}')
+
+
+def parse_client_log(file_path: Path) -> pa.Table:
+    return pa.Table.from_pylist(list(json_records(file_path)), schema=CLIENT_SCHEMA)
+
+
+def parse_origin_log(file_path: Path) -> pa.Table:
+    records = [record for record in json_records(file_path, extract_json=True) if record.get('type') == 'Versioning']
+    return pa.Table.from_pylist(records, schema=ORIGIN_SCHEMA)
+
+
+def parse_mininet_log(file_path: Path) -> pa.Table:
+    records = [record for record in json_records(file_path, extract_json=True) if 'type' in record and 'time' in record]
+    return pa.Table.from_pylist(records, schema=MININET_SCHEMA)
+
+
+def parse_process_stats_log(file_path: Path) -> pa.Table:
+    # psrecord csv: elapsed_time,nproc,cpu,mem_real,mem_virtual[,read_count,write_count,read_bytes,write_bytes]
+    stats_pdf = pd.read_csv(file_path)
+    stats_pdf.columns = [column.strip('# ').lower() for column in stats_pdf.columns]
+    return pa.Table.from_pandas(stats_pdf, preserve_index=False)
+
+
+def parse_resource_stats_log(file_path: Path) -> pa.Table:
+    # Single file of the in-process sampler: one row per observed process and sampling pass
+    return pa.Table.from_pandas(pd.read_csv(file_path, dtype={'name': 'string'}), preserve_index=False)
+
+
+def parse_link_stats_log(file_path: Path) -> pa.Table:
+    # One row per link and interval with the traffic of that interval, the relays of --backend local leave the packets empty
+    dtypes = {'link': 'string', 'interface': 'string', **{counter: 'Int64' for counter in LINK_COUNTERS}}
+    return pa.Table.from_pandas(pd.read_csv(file_path, dtype=dtypes), preserve_index=False)
+
+
+def parse_interface_stats_log(file_path: Path) -> pa.Table:
+    # Absolute counters of all interfaces, written by experiments before the link recorder
+    rows = []
+    for record in json_records(file_path):
+        for nic, counters in record['stats'].items():
+            rows.append({'time': record['time'], 'nic': nic, **dict(zip(INTERFACE_COUNTERS, counters))})
+    return pa.Table.from_pylist(rows, schema=INTERFACE_SCHEMA)
+
+
+def log_source(file_path: Path) -> Optional[tuple[str, str, Callable[[Path], pa.Table]]]:
+    """Maps a log file to its table, its partition within the table and its parser."""
+    name = file_path.name
+    if match := re.fullmatch(r'client_(\d+)\.log', name):
+        return 'client_events', f'client_number={int(match.group(1))}', parse_client_log
+    if name == 'origin.log':
+        return 'origin_versions', 'source=origin', parse_origin_log
+    if name == 'mininet.log':
+        return 'mininet_events', 'source=mininet', parse_mininet_log
+    if name == 'resource_stats.csv':
+        return 'resource_stats', 'source=sampler', parse_resource_stats_log
+    if name == 'link_stats.csv':
+        return 'link_stats', 'source=links', parse_link_stats_log
+    if name == 'interface_stats.log':
+        return 'interface_stats', 'source=interfaces', parse_interface_stats_log
+    # psrecord files are named after the monitored process, so only exact names may come before this pattern
+    if match := re.fullmatch(r'(.+)_stats\.log', name):
+        return 'process_stats', f'name={match.group(1)}', parse_process_stats_log
+    return None
+
+
+def ingest_file(file_path: Path, store_dir: Path) -> tuple[str, int]:
+    table_name, partition, parser = log_source(file_path)
+    table = parser(file_path)
+    partition_dir = store_dir / table_name / partition
+    shutil.rmtree(partition_dir, ignore_errors=True)
+    partition_dir.mkdir(parents=True)
+    pq.write_table(table, partition_dir / 'part-0.parquet')
+    return file_path.name, table.num_rows
+
+
+def file_signature(file_path: Path) -> list[int]:
+    stat = file_path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def ingest_experiment(experiment_dir: Path, workers: int = None, force: bool = False) -> Path:
+    """Converts the logs of one experiment into a Parquet store, only re-reading files that changed since the last run."""
+    store_dir = experiment_dir / STORE_DIR_NAME
+    manifest_path = store_dir / MANIFEST_NAME
+    manifest = {}
+    if manifest_path.exists() and not force:
+        manifest = json.loads(manifest_path.read_text())
+
+    changed_files = []
+    for file_path in sorted(experiment_dir.iterdir()):
+        if file_path.is_file() and log_source(file_path) is not None and manifest.get(file_path.name) != file_signature(file_path):
+            changed_files.append(file_path)
+    if not changed_files:
+        return store_dir
+
+    store_dir.mkdir(exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_name, num_rows in executor.map(ingest_file, changed_files, [store_dir] * len(changed_files)):
+            logging.info(f'Ingested {num_rows} rows from {experiment_dir / file_name}')
+
+    for file_path in changed_files:
+        manifest[file_path.name] = file_signature(file_path)
+    manifest_path.write_text(json.dumps(manifest, indent=1))
+    return store_dir
+
+
+def load_table(experiment_dir: Path, table_name: str, columns: list[str] = None, filters: list = None) -> pd.DataFrame | None:
+    table_dir = experiment_dir / STORE_DIR_NAME / table_name
+    if not table_dir.exists():
+        return None
+    table = pq.read_table(table_dir, columns=columns, filters=filters, partitioning='hive')
+    pdf = table.to_pandas()
+    for column in pdf.columns:
+        if isinstance(pdf[column].dtype, pd.CategoricalDtype):
+            pdf[column] = pdf[column].astype(pdf[column].cat.categories.dtype)
+    return pdf
+
+
+def find_experiments(data_dir: Path) -> Iterator[Path]:
+    for mininet_log in sorted(data_dir.rglob('mininet.log')):
+        yield mininet_log.parent
+
+
+@click.command()
+@click.argument('data_dir', type=click.Path(exists=True, file_okay=False, dir_okay=True))
+@click.option('--workers', type=click.IntRange(min=1), default=os.cpu_count())
+@click.option('--force', is_flag=True, default=False, help='Re-ingest all files, even unchanged ones')
+def main(data_dir: str, workers: int, force: bool):
+    """Ingests the logs of all experiments below DATA_DIR into per-experiment Parquet stores."""
+    logging.basicConfig(level=logging.INFO)
+    for experiment_dir in find_experiments(Path(data_dir)):
+        store_dir = ingest_experiment(experiment_dir, workers, force)
+        logging.info(f'Parquet store of {experiment_dir} is up to date: {store_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from analysis.ingest import ingest_experiment, load_table, log_source, parse_interface_stats_log, parse_process_stats_log
+
+
+class TestIngestExperiment(unittest.TestCase):
+
+    def write_logs(self, experiment_dir: Path, client_versions: int):
+        with (experiment_dir / 'mininet.log').open('w') as mininet_log:
+            mininet_log.write('INFO:root:Creating Mininet Topology\n')
+            mininet_log.write('INFO:root:' + json.dumps({'type': 'Update', 'time': 1000, 'active_clients': 0}) + '\n')
+        with (experiment_dir / 'origin.log').open('w') as origin_log:
+            origin_log.write('[server]: Server is running at http://localhost:3000\n')
+            origin_log.write(json.dumps({'type': 'Versioning', 'time': 1, 'object': 'flights', 'version': 0}, separators=(',', ':')) + '\n')
+        with (experiment_dir / 'client_3.log').open('w') as client_log:
+            for version in range(client_versions):
+                client_log.write(json.dumps({'type': 'Versioning', 'time': 2000 + version, 'object': 'flights', 'version': version, 'duration': 5, 'cached': True}) + '\n')
+            client_log.write(json.dumps({'type': 'Success', 'event': 'booked seat 1 True', 'time': 3000, 'duration': 5, 'total_duration': 9}) + '\n')
+
+    def test_ingest_and_reingest_changed_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            experiment_dir = Path(tmp_dir)
+            self.write_logs(experiment_dir, 2)
+            ingest_experiment(experiment_dir, workers=1)
+
+            versions = load_table(experiment_dir, 'client_events', columns=['client_number', 'version'], filters=[('type', '=', 'Versioning')])
+            self.assertEqual(versions['version'].tolist(), [0, 1])
+            self.assertEqual(versions['client_number'].tolist(), [3, 3])
+            self.assertEqual(load_table(experiment_dir, 'mininet_events', columns=['active_clients'])['active_clients'].tolist(), [0])
+            self.assertEqual(len(load_table(experiment_dir, 'origin_versions')), 1)
+
+            self.write_logs(experiment_dir, 4)
+            ingest_experiment(experiment_dir, workers=1)
+            self.assertEqual(len(load_table(experiment_dir, 'client_events', filters=[('type', '=', 'Versioning')])), 4)
+
+    def test_link_stats_without_packets(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            experiment_dir = Path(tmp_dir)
+            (experiment_dir / 'link_stats.csv').write_text('time,link,interface,interval,bytes_down,bytes_up,packets_down,packets_up\n'
+                                                           '100,origin,relay,100,2048,512,,\n100,e1-clients,s2-eth1,100,1024,256,3,2\n')
+            ingest_experiment(experiment_dir, workers=1)
+            links = load_table(experiment_dir, 'link_stats')
+            self.assertEqual(links['bytes_down'].tolist(), [2048, 1024])
+            self.assertTrue(pd.isna(links['packets_down'].iloc[0]))
+
+    def test_interface_stats_log(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            experiment_dir = Path(tmp_dir)
+            interface_log = experiment_dir / 'interface_stats.log'
+            interface_log.write_text(json.dumps({'time': 100, 'stats': {'s1-eth1': [2048, 1024, 3, 2, 0, 0, 0, 0]}}) + '\n')
+            self.assertEqual(log_source(interface_log), ('interface_stats', 'source=interfaces', parse_interface_stats_log))
+            self.assertEqual(log_source(experiment_dir / 'edge_1_stats.log'), ('process_stats', 'name=edge_1', parse_process_stats_log))
+
+            ingest_experiment(experiment_dir, workers=1)
+            interfaces = load_table(experiment_dir, 'interface_stats')
+            self.assertEqual(interfaces['nic'].tolist(), ['s1-eth1'])
+            self.assertEqual(interfaces['bytes_recv'].tolist(), [1024])
+            self.assertIsNone(load_table(experiment_dir, 'process_stats'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+import pandas as pd
+
+
+def link_traffic(link_pdfs: dict[str, pd.DataFrame], baseline_mode: str = 'proxy') -> pd.DataFrame:
+    """Traffic per mode and link from the link_stats table, with the share of downstream bytes saved against `baseline_mode`.
+
+    The saving of the `origin` link is the origin egress a caching mode saves compared to proxying every request.
+    """
+    rows = []
+    for mode, link_pdf in link_pdfs.items():
+        for link, samples in link_pdf.groupby('link'):
+            seconds = samples['interval'].sum() / 10**9
+            rates = samples['bytes_down'] * 8 / (samples['interval'] / 10**9) / 10**6
+            rows.append({'mode': mode, 'link': link, 'mb_down': samples['bytes_down'].sum() / 10**6, 'mb_up': samples['bytes_up'].sum() / 10**6,
+                         'mbit_down_mean': samples['bytes_down'].sum() * 8 / seconds / 10**6 if seconds > 0 else 0.0, 'mbit_down_p99': rates.quantile(0.99)})
+    traffic = pd.DataFrame(rows, columns=['mode', 'link', 'mb_down', 'mb_up', 'mbit_down_mean', 'mbit_down_p99']).set_index(['mode', 'link'])
+    if baseline_mode in link_pdfs:
+        baseline = traffic.xs(baseline_mode, level='mode')['mb_down']
+        traffic['saved'] = 1 - traffic['mb_down'] / baseline.reindex(traffic.index.get_level_values('link')).to_numpy()
+    return traffic
@@ -0,0 +1,22 @@
+import unittest
+
+import pandas as pd
+
+from analysis.links import link_traffic
+
+
+class TestLinks(unittest.TestCase):
+
+    def test_link_traffic(self):
+        proxy_pdf = pd.DataFrame({'link': ['origin', 'origin', 'e1-clients'], 'interval': [100_000_000] * 3,
+                                  'bytes_down': [1_000_000, 3_000_000, 5_000_000], 'bytes_up': [10, 10, 20]})
+        crdt_pdf = pd.DataFrame({'link': ['origin', 'origin'], 'interval': [100_000_000] * 2, 'bytes_down': [1_000_000, 0], 'bytes_up': [10, 0]})
+        result = link_traffic({'proxy': proxy_pdf, 'crdt': crdt_pdf})
+        self.assertEqual(result.loc[('proxy', 'origin'), 'mb_down'], 4.0)
+        self.assertEqual(result.loc[('proxy', 'origin'), 'mbit_down_mean'], 160.0)
+        self.assertEqual(result.loc[('crdt', 'origin'), 'saved'], 0.75)
+        self.assertEqual(result.loc[('proxy', 'e1-clients'), 'saved'], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
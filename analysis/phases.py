@@ -0,0 +1,18 @@
+import pandas as pd
+
+PHASES = ['connect', 'ttfb', 'transfer', 'decode', 'think']
+
+
+def phase_summary(client_pdfs: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Count, mean, median and p99 (in ms) of every request phase per mode, from client events logged with --phase-timing."""
+    rows = []
+    for mode, client_pdf in client_pdfs.items():
+        for phase in PHASES:
+            if phase not in client_pdf.columns:
+                continue
+            durations = client_pdf[phase].dropna() / 10**6
+            if len(durations) == 0:
+                continue
+            rows.append({'mode': mode, 'phase': phase, 'count': len(durations), 'mean': durations.mean(),
+                         'p50': durations.quantile(0.5), 'p99': durations.quantile(0.99)})
+    return pd.DataFrame(rows, columns=['mode', 'phase', 'count', 'mean', 'p50', 'p99']).set_index(['mode', 'phase'])
@@ -0,0 +1,22 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from analysis.phases import phase_summary
+
+
+class TestPhases(unittest.TestCase):
+
+    def test_phase_summary(self):
+        crdt_pdf = pd.DataFrame({'type': ['Versioning', 'Versioning', 'Success'], 'connect': [1_000_000, 0, 0],
+                                 'ttfb': [2_000_000, 4_000_000, 6_000_000], 'decode': [3_000_000, 5_000_000, np.nan]})
+        proxy_pdf = pd.DataFrame({'type': ['Versioning'], 'connect': [np.nan]})
+        result = phase_summary({'crdt': crdt_pdf, 'proxy': proxy_pdf})
+        self.assertEqual(result.index.tolist(), [('crdt', 'connect'), ('crdt', 'ttfb'), ('crdt', 'decode')])
+        self.assertEqual(result.loc[('crdt', 'ttfb'), 'mean'], 4.0)
+        self.assertEqual(result.loc[('crdt', 'decode'), 'count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+def assign_buckets(times: np.ndarray, mininet_pdf: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Assigns each row time to the active_clients bucket it was recorded in and returns (bucket, bucket duration).
+
+    Equivalent to walking the rows in order: a row goes to the first bucket (starting at 1) whose end is not
+    before the row time, buckets never move backwards, and the last bucket lasts forever.
+    """
+    sorted_buckets = mininet_pdf.set_index('active_clients')['time'].sort_values(ascending=True).to_dict()
+    num_buckets = len(sorted_buckets) - 1
+    bucket_starts = np.array([sorted_buckets[bucket] for bucket in range(1, num_buckets + 1)])
+    bucket_ends = bucket_starts[1:]
+
+    buckets = 1 + np.searchsorted(bucket_ends, times, side='left')
+    if len(buckets) > 0:
+        buckets = np.maximum.accumulate(buckets)
+
+    durations = np.append(bucket_ends - bucket_starts[:-1], 0)[buckets - 1]
+    if np.any(buckets == num_buckets):
+        durations = durations.astype(float)
+        durations[buckets == num_buckets] = np.inf
+    return buckets, durations
+
+
+def bucket_df(pdf: pd.DataFrame, mininet_pdf: pd.DataFrame) -> pd.DataFrame:
+    buckets, durations = assign_buckets(pdf['time'].to_numpy(), mininet_pdf)
+    pdf2 = pdf.copy()
+    # Assigned by label like the row-wise implementation, so rows keep the bucket of their position
+    pdf2['active_clients'] = pd.Series(buckets)
+    pdf2['active_clients_duration'] = pd.Series(durations)
+    return pdf2
+
+
+def max_read_times(client_pdfs: Iterable[pd.DataFrame]) -> pd.Series:
+    """Latest time (in µs) any client read each (object, version), reduced one client frame at a time.
+
+    This is not a time-ordered pass with bounded memory per object: a client may read an old version at any later
+    time, so an exact result has to keep the latest read of every (object, version). Memory therefore grows with
+    the number of versions, but no longer with the number of reads or clients.
+    """
+    latest: pd.Series | None = None
+    for client_pdf in client_pdfs:
+        client_latest = (client_pdf['time'] / 10**3).groupby([client_pdf['object'], client_pdf['version']]).max()
+        latest = client_latest if latest is None else pd.concat([latest, client_latest]).groupby(level=[0, 1]).max()
+    if latest is None:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=['object', 'version']))
+    return latest
+
+
+def calculate_inconsistency_window(origin_pdf: pd.DataFrame, client_pdfs: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """How long (in ms) after the origin created a version clients were still reading the previous one."""
+    origin_pdf = origin_pdf[origin_pdf['version'] > 0]
+    latest_reads = max_read_times(client_pdfs).rename('time_client')
+
+    joined_pdf = pd.DataFrame({
+        'active_clients_origin': origin_pdf['active_clients'].to_numpy(),
+        'object': origin_pdf['object'].to_numpy(),
+        'version': origin_pdf['version'].to_numpy(),
+        'time_origin': origin_pdf['time'].to_numpy(),
+        'last_version': (origin_pdf['version'] - 1).to_numpy(),
+    }).join(latest_reads, on=['object', 'last_version'], how='inner').drop(columns='last_version')
+    joined_pdf = joined_pdf.sort_values(['active_clients_origin', 'object', 'version', 'time_origin']).reset_index(drop=True)
+
+    joined_pdf['inconsistency_window'] = (joined_pdf['time_client'] - joined_pdf['time_origin']) / 10**3
+    joined_pdf.loc[joined_pdf['inconsistency_window'] < 0, 'inconsistency_window'] = 0
+    return joined_pdf
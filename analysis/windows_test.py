@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from analysis.windows import bucket_df, calculate_inconsistency_window
+
+
+def walk_buckets(times, sorted_buckets: dict):
+    # Row-wise reference of the bucket assignment
+    current_bucket = 1
+    last_bucket_time = sorted_buckets[current_bucket]
+    current_bucket_time = sorted_buckets[current_bucket + 1]
+    for row_time in times:
+        while row_time > current_bucket_time:
+            current_bucket += 1
+            if len(sorted_buckets) > current_bucket + 1:
+                last_bucket_time = sorted_buckets[current_bucket]
+                current_bucket_time = sorted_buckets[current_bucket + 1]
+            else:
+                current_bucket_time = np.inf
+        yield [current_bucket, current_bucket_time - last_bucket_time]
+
+
+class TestWindows(unittest.TestCase):
+
+    def test_bucket_df_matches_row_walk(self):
+        rng = np.random.default_rng(7)
+        mininet_pdf = pd.DataFrame({'time': np.sort(rng.integers(0, 10**9, 11)), 'active_clients': np.arange(11)})
+        pdf = pd.DataFrame({'time': np.sort(rng.integers(-10**6, 11 * 10**8, 1000))})
+
+        expected = pd.DataFrame.from_records(walk_buckets(pdf['time'], mininet_pdf.set_index('active_clients')['time'].to_dict()), columns=['bucket', 'bucket_time'])
+        result = bucket_df(pdf, mininet_pdf)
+        self.assertEqual(result['active_clients'].tolist(), expected['bucket'].tolist())
+        self.assertEqual(result['active_clients_duration'].tolist(), expected['bucket_time'].tolist())
+
+    def test_inconsistency_window(self):
+        origin_pdf = pd.DataFrame({'type': 'Versioning', 'object': ['flight_1', 'flight_1', 'flight_1', 'flight_2'], 'version': [0, 1, 2, 1],
+                                   'time': [0, 1000, 5000, 2000], 'active_clients': [1, 1, 2, 2]})
+        client_pdfs = [
+            pd.DataFrame({'time': [500_000, 3_000_000], 'object': ['flight_1', 'flight_1'], 'version': [0, 0]}),
+            pd.DataFrame({'time': [4_000_000, 900_000], 'object': ['flight_1', 'flight_2'], 'version': [1, 0]}),
+        ]
+        result = calculate_inconsistency_window(origin_pdf, iter(client_pdfs))
+        self.assertEqual(result[['object', 'version']].values.tolist(), [['flight_1', 1], ['flight_1', 2], ['flight_2', 1]])
+        self.assertEqual(result['inconsistency_window'].tolist(), [2.0, 0.0, 0.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from json import JSONDecodeError
+from typing import Any, Callable
+
+import aiohttp
+
+from client_log import log_event, log_request_start, log_version, log_schedule
+from decoding import flight_listing, forum_listing, free_seats, loads, meta_only
+from edge_selection import hedging_enabled, routed_request_async, routed_timeout, session_url
+from phase_timing import begin_request, phase_timing_enabled, phase_trace_config, record_decoded, record_mark
+from revalidation import fork_validator_cache, revalidation_headers, validator_cache
+from request_trace import TraceEntry, log_replayed_response, read_trace, record_request
+from workload import ClientWorkload, arrival_rng, arrival_timeline
+
+
+async def send_request_async(session: aiohttp.ClientSession, method: str, edge_server_url: str, path: str, headers: dict, json_body: dict = None) -> aiohttp.ClientResponse:
+    log_request_start()
+    record_request(method, path, json_body)
+    headers = revalidation_headers(method, path, headers)
+    timed = begin_request()
+
+    async def send(url: str) -> aiohttp.ClientResponse:
+        async with session.request(method, f'{url}{path}', headers=headers, json=json_body) as response:
+            if timed:
+                record_mark('headers')
+            # The body stays available on the response after the connection went back to the pool
+            await response.read()
+            if timed:
+                record_mark('body')
+        return response
+
+    return await routed_request_async(method, edge_server_url, send)
+
+
+async def decode_response_async(path: str, response: aiohttp.ClientResponse, extract: Callable[[Any], Any] = None):
+    cache = validator_cache.get()
+    if cache is not None and response.status == 304:
+        body = cache.not_modified_body(path)
+    else:
+        body = await response.json(content_type=None, loads=loads)
+        if extract is not None and response.ok:
+            body = extract(body)
+        if cache is not None:
+            cache.store(path, response.headers.get('ETag'), body)
+    record_decoded()
+    return body
+
+
+async def run_flights_client_async(session: aiohttp.ClientSession, edge_server_url: str, headers: dict, runs: int, client_number: int, workload: ClientWorkload, scheduled_time: int = None):
+    start_time = scheduled_time or time.time_ns()
+    last_query_time = start_time
+
+    try:
+        # 1 Get flights
+        flightsRequest = await send_request_async(session, 'GET', edge_server_url, '/flights', headers)
+        flights = await decode_response_async('/flights', flightsRequest, flight_listing)
+        if not flightsRequest.ok:
+            log_event('Inconsistent', f'Outdated information {flights}', last_query_time, start_time, object='flights', client_number=client_number)
+            return
+
+        log_version(flights["meta"], flightsRequest, last_query_time, client_number=client_number)
+
+        my_flight_number = flights['items'][workload.item_choice()]
+
+        # Get concrete flight plan
+        last_query_time = time.time_ns()
+        flightDetailsPath = f'/flights/{my_flight_number}'
+        flightDetailRequest = await send_request_async(session, 'GET', edge_server_url, flightDetailsPath, headers)
+        flightDetails = await decode_response_async(flightDetailsPath, flightDetailRequest, free_seats)
+        if not flightDetailRequest.ok:
+            log_event('Inconsistent', f'Outdated information {flightDetails}', last_query_time, start_time,
+                      object=f'flight_{my_flight_number}', client_number=client_number)
+            return
+
+        log_version(flightDetails["meta"], flightDetailRequest, last_query_time, client_number=client_number)
+
+        # Select a seat
+        available_seats = flightDetails['available_seats']
+
+        if len(available_seats) == 0:
+            log_event('Conflict', f'seatPlan empty', last_query_time, start_time, client_number=client_number)
+            return
+
+        chosen_seat = workload.seat_choice(available_seats)
+
+        # Book the seat
+        last_query_time = time.time_ns()
+        result = await send_request_async(session, 'POST', edge_server_url, f'{flightDetailsPath}/book/{chosen_seat}', headers)
+        resultJson = await decode_response_async(f'{flightDetailsPath}/book/{chosen_seat}', result)
+        if result.ok:
+            log_event('Success', f'booked seat {chosen_seat} {resultJson["success"]}', last_query_time, start_time, client_number=client_number)
+        elif result.status == 404:
+            log_event('Inconsistent', f'Outdated information {flightDetails}', last_query_time, start_time,
+                      object=f'flight_{my_flight_number}', client_number=client_number)
+        else:
+            log_event('Conflict', f'Error booking seat {chosen_seat}: {resultJson}', last_query_time, start_time, client_number=client_number)
+
+    except JSONDecodeError as e:
+        logging.error(f'Coudl not decode JSON: {e.msg}, {e.doc}, {e.pos}', exc_info=e)
+        log_event('Failure', f'json decode {e}', last_query_time, start_time, client_number=client_number)
+    except Exception as e:
+        logging.error(f'Exception occurred: {e}', exc_info=e)
+        log_event('Failure', f'error {e}', last_query_time, start_time, client_number=client_number)
+        await asyncio.sleep(0.01 + random.random())
+
+
+async def run_forum_client_async(session: aiohttp.ClientSession, edge_server_url: str, headers: dict, runs: int, client_number: int, workload: ClientWorkload, scheduled_time: int = None):
+    start_time = scheduled_time or time.time_ns()
+    last_query_time = start_time
+    try:
+        # 1 Get all Forums
+        forumRequest = await send_request_async(session, 'GET', edge_server_url, '/forums', headers)
+        forums = await decode_response_async('/forums', forumRequest, forum_listing)
+        if not forumRequest.ok:
+            log_event('Inconsistent', f'Outdated information {forums["errors"]}', last_query_time, start_time, object='forums', client_number=client_number)
+            return
+
+        log_version(forums["meta"], forumRequest, last_query_time, client_number=client_number)
+
+        my_forum_int_choice = workload.item_choice()
+        my_forum_id = forums['items'][my_forum_int_choice]
+
+        # Get concrete forum
+        last_query_time = time.time_ns()
+        forumDetailsPath = f'/forums/{my_forum_id}'
+        forumDetailRequest = await send_request_async(session, 'GET', edge_server_url, forumDetailsPath, headers)
+        forumDetails = await decode_response_async(forumDetailsPath, forumDetailRequest, meta_only)
+        if not forumDetailRequest.ok:
+            log_event('Failure', f'Not found {forumDetails["errors"]}', last_query_time, start_time,
+                      object=f'forum_{my_forum_int_choice}', client_number=client_number)
+            return
+
+        log_version(forumDetails["meta"], forumDetailRequest, last_query_time, client_number=client_number)
+
+        # Post a message
+        post = runs % 5 == 0
+        if post:
+            forumPost = workload.post_message()
+            result = await send_request_async(session, 'POST', edge_server_url, forumDetailsPath, headers, { 'message': forumPost })
+            resultJson = await decode_response_async(forumDetailsPath, result)
+            if result.ok:
+                log_event('Success', f'posted message', last_query_time, start_time, client_number=client_number)
+            else:
+                log_event('Failure', f'Error {resultJson}', last_query_time, start_time,
+                          object=f'forum_{my_forum_int_choice}', client_number=client_number)
+
+    except JSONDecodeError as e:
+        logging.error(f'Coudl not decode JSON: {e.msg}, {e.doc}, {e.pos}', exc_info=e)
+        log_event('Failure', f'json decode {e}', last_query_time, start_time, client_number=client_number)
+    except Exception as e:
+        logging.error(f'Exception occurred: {e}', exc_info=e)
+        log_event('Failure', f'error {e}', last_query_time, start_time, client_number=client_number)
+        await asyncio.sleep(0.01 + random.random())
+
+
+async def run_virtual_client(session: aiohttp.ClientSession, api: str, edge_server_url: str, headers: dict, test: int, client_number: int, workload: ClientWorkload,
+                             should_stop: Callable[[], bool]):
+    fork_validator_cache()
+    n = 0
+    while not should_stop():
+        if test is not None:
+            if n >= test:
+                break
+        n += 1
+
+        if api == 'flights':
+            await run_flights_client_async(session, session_url(edge_server_url), headers, n, client_number, workload)
+        elif api == 'forums':
+            await run_forum_client_async(session, session_url(edge_server_url), headers, n, client_number, workload)
+
+
+async def replay_request_async(session: aiohttp.ClientSession, edge_server_url: str, headers: dict, entry: TraceEntry, start_time: int, client_number: int):
+    try:
+        response = await send_request_async(session, entry.method, edge_server_url, entry.path, headers, entry.body)
+        log_replayed_response(entry, response, response.status, await decode_response_async(entry.path, response), start_time, client_number)
+    except Exception as e:
+        logging.error(f'Exception occurred: {e}', exc_info=e)
+        log_event('Failure', f'error {e}', start_time, start_time, client_number=client_number)
+
+
+async def run_replay(session: aiohttp.ClientSession, edge_server_url: str, headers: dict, test: int, client_number: int, should_stop: Callable[[], bool],
+                     replay_trace: str, replay_speed: float):
+    fork_validator_cache()
+    n = 0
+    replay_start = time.time_ns()
+    for entry in read_trace(replay_trace):
+        if should_stop() or (test is not None and n >= test):
+            break
+        n += 1
+
+        scheduled_time = time.time_ns()
+        if replay_speed > 0:
+            scheduled_time = replay_start + int(entry.offset / replay_speed)
+            wait = (scheduled_time - time.time_ns()) / 10**9
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        await replay_request_async(session, session_url(edge_server_url), headers, entry, scheduled_time, client_number)
+
+
+async def run_open_loop(session: aiohttp.ClientSession, api: str, edge_server_url: str, headers: dict, test: int, client_number: int, workloads: list[ClientWorkload],
+                        should_stop: Callable[[], bool], rate: float, arrival: str, seed: int):
+    # Sessions are started on schedule even if earlier ones are still running; the pool size
+    # bounds the connections, so excess sessions queue and the wait shows up in their latency
+    # Like in the closed loop, --test counts the sessions of every virtual client
+    sessions = None if test is None else test * len(workloads)
+    # The sessions of a virtual client all run in its context, so they share its validator cache and phase timing
+    contexts = []
+    for _ in workloads:
+        context = contextvars.copy_context()
+        context.run(fork_validator_cache)
+        contexts.append(context)
+    n = 0
+    running = set()
+    timeline_start = time.time_ns()
+    for offset in arrival_timeline(rate, arrival, arrival_rng(seed, client_number)):
+        if should_stop() or (sessions is not None and n >= sessions):
+            break
+        n += 1
+
+        scheduled_time = timeline_start + offset
+        wait = (scheduled_time - time.time_ns()) / 10**9
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        virtual_client = (n - 1) % len(workloads)
+        session_client = client_number + virtual_client
+        log_schedule(n, scheduled_time, client_number=session_client)
+        if api == 'flights':
+            client = run_flights_client_async(session, session_url(edge_server_url), headers, n, session_client, workloads[virtual_client], scheduled_time)
+        else:
+            client = run_forum_client_async(session, session_url(edge_server_url), headers, n, session_client, workloads[virtual_client], scheduled_time)
+        task = asyncio.create_task(client, context=contexts[virtual_client])
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    if running:
+        await asyncio.wait(running)
+
+
+async def run_virtual_clients(api: str, edge_server_url: str, headers: dict, test: int, client_number: int, virtual_clients: int, should_stop: Callable[[], bool],
+                              make_workload: Callable[[int], ClientWorkload], rate: float = None, arrival: str = 'poisson',
+                              replay_trace: str = None, replay_speed: float = 1.0, seed: int = 42):
+    workloads = [make_workload(client_number + i) for i in range(virtual_clients)]
+    # One keep-alive connection per virtual client, shared through a single pool, hedged requests need a second one
+    connector = aiohttp.TCPConnector(limit=virtual_clients * (2 if hedging_enabled() else 1), keepalive_timeout=60)
+    trace_configs = [phase_trace_config()] if phase_timing_enabled() else None
+    timeout = aiohttp.ClientTimeout(total=routed_timeout()) if routed_timeout() is not None else aiohttp.client.DEFAULT_TIMEOUT
+    async with aiohttp.ClientSession(connector=connector, trace_configs=trace_configs, timeout=timeout) as session:
+        if replay_trace is not None:
+            # Every virtual client replays the whole trace
+            await asyncio.gather(*[
+                run_replay(session, edge_server_url, headers, test, client_number + i, should_stop, replay_trace, replay_speed)
+                for i in range(virtual_clients)
+            ])
+            return
+
+        if rate is not None:
+            await run_open_loop(session, api, edge_server_url, headers, test, client_number, workloads, should_stop, rate, arrival, seed)
+            return
+
+        await asyncio.gather(*[
+            run_virtual_client(session, api, edge_server_url, headers, test, client_number + i, workloads[i], should_stop)
+            for i in range(virtual_clients)
+        ])
+
+
+def run_async_engine(api: str, edge_server_url: str, headers: dict, test: int, client_number: int, virtual_clients: int, should_stop: Callable[[], bool],
+                     make_workload: Callable[[int], ClientWorkload], rate: float = None, arrival: str = 'poisson', replay_trace: str = None, replay_speed: float = 1.0,
+                     seed: int = 42):
+    asyncio.run(run_virtual_clients(api, edge_server_url, headers, test, client_number, virtual_clients, should_stop, make_workload, rate, arrival,
+                                    replay_trace, replay_speed, seed))
@@ -0,0 +1,106 @@
+import logging
+import time
+from typing import Callable, Dict
+
+from requests import Response
+
+from event_log import JsonLinesSink
+from histogram import HistogramRecorder
+from edge_selection import take_served_edge
+from phase_timing import take_phases
+
+event_sink = JsonLinesSink()
+histogram_recorder: HistogramRecorder = None
+first_request_callback: Callable[[int], None] = None
+
+
+def set_event_sink(sink):
+    global event_sink
+    event_sink = sink
+
+
+def close_event_sink():
+    event_sink.close()
+
+
+def set_histogram_recorder(recorder: HistogramRecorder):
+    global histogram_recorder
+    histogram_recorder = recorder
+
+
+def close_histogram_recorder():
+    if histogram_recorder is not None:
+        histogram_recorder.close()
+
+
+def set_first_request_callback(callback: Callable[[int], None]):
+    global first_request_callback
+    first_request_callback = callback
+
+
+def log_request_start():
+    # Only the first request of the client is reported, e.g. to the zygote that launched it
+    global first_request_callback
+    if first_request_callback is not None:
+        callback, first_request_callback = first_request_callback, None
+        callback(time.time_ns())
+
+
+def log_event(event: str, details: str, start_time: int, total_start_time: int, object: str = None, client_number: int = None):
+    curr_time = time.time_ns()
+    duration = curr_time - start_time
+    total_duration = curr_time - total_start_time
+    log_msg = {'type': event, 'event': details, 'time': time.time_ns(), 'duration': duration, 'total_duration': total_duration}
+    if object is not None:
+        log_msg['object'] = object
+    phases = take_phases()
+    if phases is not None:
+        log_msg.update(phases)
+    served = take_served_edge()
+    if served is not None:
+        log_msg.update(served)
+    if client_number is not None:
+        log_msg['client'] = client_number
+    if histogram_recorder is not None:
+        histogram_recorder.record(event, object, None, duration)
+    event_sink.write(log_msg)
+
+
+def log_version(meta: Dict, response: Response, start_time: int, client_number: int = None):
+    try:
+        cached = None
+        cachedHeader = response.headers.get('X-Cached')
+        if cachedHeader:
+            cached = cachedHeader == 'true'
+        duration = time.time_ns() - start_time
+        log_msg = { 'type': 'Versioning', 'time': time.time_ns(), 'object': meta['id'], 'version': meta['version'], 'duration': duration, 'cached': cached }
+        status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+        lengthHeader = response.headers.get('Content-Length')
+        if status == 304:
+            # A cache hit may forward the stored Content-Length of the origin, a 304 never carries a body
+            log_msg['bytes'] = 0
+            log_msg['not_modified'] = True
+        elif lengthHeader is not None:
+            log_msg['bytes'] = int(lengthHeader)
+        phases = take_phases()
+        if phases is not None:
+            log_msg.update(phases)
+        served = take_served_edge()
+        if served is not None:
+            log_msg.update(served)
+        if client_number is not None:
+            log_msg['client'] = client_number
+        if histogram_recorder is not None:
+            histogram_recorder.record('Versioning', meta['id'], cached, duration)
+        event_sink.write(log_msg)
+    except Exception as err:
+        logging.exception(f'Exception during logging version {err}', exc_info=err)
+        raise err
+
+
+def log_schedule(session: int, scheduled_time: int, client_number: int = None):
+    curr_time = time.time_ns()
+    log_msg = {'type': 'Schedule', 'time': curr_time, 'session': session, 'scheduled': scheduled_time, 'lag': curr_time - scheduled_time}
+    if client_number is not None:
+        log_msg['client'] = client_number
+    event_sink.write(log_msg)
@@ -0,0 +1,38 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(body: bytes | str) -> Any:
+    # orjson.JSONDecodeError is a json.JSONDecodeError, callers handle both backends alike
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def listing_items(document: dict, key: str) -> dict:
+    """Keeps the meta and the `key` of every listed flight or forum, in the order of the listing."""
+    data = document['data']
+    items = data.values() if type(data) is dict else data
+    return {'meta': document['meta'], 'items': [item[key] for item in items]}
+
+
+def flight_listing(document: dict) -> dict:
+    return listing_items(document, 'number')
+
+
+def forum_listing(document: dict) -> dict:
+    return listing_items(document, 'id')
+
+
+def free_seats(document: dict) -> dict:
+    """Keeps the meta and the numbers of the unbooked seats of a flight, in the order of its seating plan."""
+    return {'meta': document['meta'], 'available_seats': [seat['number'] for seat in document['data']['seatingPlan'].values() if not seat['booked']]}
+
+
+def meta_only(document: dict) -> dict:
+    return {'meta': document['meta']}
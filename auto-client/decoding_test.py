@@ -0,0 +1,37 @@
+import json
+import unittest
+from unittest import mock
+
+import decoding
+from decoding import flight_listing, forum_listing, free_seats, loads, meta_only
+
+
+class TestDecoding(unittest.TestCase):
+
+    def setUp(self):
+        seating_plan = {f'{i}': {'number': i, 'booked': i % 3 == 0} for i in range(100)}
+        self.flight = json.dumps({'data': {'number': '7', 'seatingPlan': seating_plan, 'seatsLeft': 66}, 'meta': {'id': 'flight_7', 'version': 4}}).encode()
+        self.flights = json.dumps({'data': {f'{i}': {'number': f'{i}'} for i in range(3)}, 'meta': {'id': 'flights', 'version': 0}}).encode()
+        self.forums = json.dumps({'data': [{'id': i, 'title': f'"forum" {i}'} for i in range(3)], 'meta': {'id': 'forums', 'version': 2}}).encode()
+
+    def test_backends_agree(self):
+        for body in [self.flight, self.flights, self.forums]:
+            with mock.patch.object(decoding, 'orjson', None):
+                self.assertEqual(loads(body), json.loads(body))
+            self.assertEqual(loads(body), json.loads(body))
+
+    def test_extract_matches_full_decode(self):
+        flight = json.loads(self.flight)
+        self.assertEqual(free_seats(loads(self.flight)), {
+            'meta': flight['meta'], 'available_seats': [seat['number'] for seat in flight['data']['seatingPlan'].values() if not seat['booked']]})
+        self.assertEqual(flight_listing(loads(self.flights))['items'], ['0', '1', '2'])
+        self.assertEqual(forum_listing(loads(self.forums)), {'meta': {'id': 'forums', 'version': 2}, 'items': [0, 1, 2]})
+        self.assertEqual(meta_only(loads(self.forums)), {'meta': {'id': 'forums', 'version': 2}})
+
+    def test_decode_error(self):
+        with self.assertRaises(json.JSONDecodeError):
+            loads(b'{"data": ')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable
+
+import aiohttp
+import requests
+
+# Weight of the newest sample in the moving estimates
+ALPHA = 0.2
+# A failed request costs a client about as much as waiting this long (ns), fast failures like refused connections are not a fast edge
+FAILURE_COST = 10**9
+# Share of sessions that go to another edge than the best one, so the estimates of the other edges stay current
+EXPLORE = 0.05
+
+
+class EdgeEstimate:
+    """Moving averages of the latency (ns) and the error rate of one edge."""
+    edge: str
+    latency: float | None
+    error_rate: float
+
+    def __init__(self, edge: str):
+        self.edge = edge
+        self.latency = None
+        self.error_rate = 0.0
+
+    def record(self, duration: int, ok: bool):
+        if ok:
+            self.latency = duration if self.latency is None else (1 - ALPHA) * self.latency + ALPHA * duration
+        self.error_rate = (1 - ALPHA) * self.error_rate + ALPHA * (0.0 if ok else 1.0)
+
+    def score(self) -> float:
+        # Edges that never answered yet are tried first
+        return (self.latency or 0.0) + self.error_rate * FAILURE_COST
+
+
+class EdgeRouter:
+    """Routes every session to the edge with the best estimate, failed requests move on to the next best edges.
+
+    `edge_urls` maps the edges (host:port) to their base URLs, ties are broken by their order.
+    """
+    estimates: dict[str, EdgeEstimate]
+
+    def __init__(self, edge_urls: dict[str, str], timeout: float = None, hedge_after: float = None, seed: int = None):
+        self.estimates = {url: EdgeEstimate(edge) for edge, url in edge_urls.items()}
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.random = random.Random(seed)
+
+    def ranked(self) -> list[str]:
+        return sorted(self.estimates, key=lambda url: self.estimates[url].score())
+
+    def choose(self) -> str:
+        ranked = self.ranked()
+        if len(ranked) > 1 and self.random.random() < EXPLORE:
+            return self.random.choice(ranked[1:])
+        return ranked[0]
+
+    def candidates(self, url: str) -> list[str]:
+        return [url] + [other for other in self.ranked() if other != url]
+
+    def record(self, url: str, duration: int, ok: bool):
+        self.estimates[url].record(duration, ok)
+
+    def edge(self, url: str) -> str:
+        return self.estimates[url].edge
+
+
+edge_router: EdgeRouter | None = None
+# Edge and number of attempts of the last request, added to the next logged record
+served_edge: ContextVar[tuple[str, int] | None] = ContextVar('served_edge', default=None)
+
+
+def set_edge_router(router: EdgeRouter | None):
+    global edge_router
+    edge_router = router
+
+
+def session_url(edge_server_url: str) -> str:
+    """Base URL for the next session, the single --edge-server without a router."""
+    if edge_router is None:
+        return edge_server_url
+    return edge_router.choose()
+
+
+def routed_timeout() -> float | None:
+    return None if edge_router is None else edge_router.timeout
+
+
+def hedging_enabled() -> bool:
+    return edge_router is not None and edge_router.hedge_after is not None
+
+
+def take_served_edge() -> dict | None:
+    served = served_edge.get()
+    if served is None:
+        return None
+    served_edge.set(None)
+    return {'edge': served[0], 'attempts': served[1]}
+
+
+def routed_request(method: str, url: str, send: Callable[[str], requests.Response]) -> requests.Response:
+    """Sends the request to `url` and, if it fails, to the next edges in turn.
+
+    Only GETs are repeated after a timeout or a server error, a POST may have taken effect already.
+    """
+    if edge_router is None:
+        return send(url)
+    candidates = edge_router.candidates(url)
+    for attempt, candidate in enumerate(candidates, start=1):
+        served_edge.set((edge_router.edge(candidate), attempt))
+        last = attempt == len(candidates)
+        start = time.perf_counter_ns()
+        try:
+            response = send(candidate)
+        except requests.RequestException as e:
+            edge_router.record(candidate, time.perf_counter_ns() - start, False)
+            if last or not (isinstance(e, requests.ConnectionError) or (method == 'GET' and isinstance(e, requests.Timeout))):
+                raise
+            continue
+        ok = response.status_code < 500
+        edge_router.record(candidate, time.perf_counter_ns() - start, ok)
+        if ok or last or method != 'GET':
+            return response
+
+
+def retryable(method: str, error: Exception) -> bool:
+    return isinstance(error, aiohttp.ClientConnectorError) or (method == 'GET' and isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)))
+
+
+async def routed_request_async(method: str, url: str, send: Callable[[str], Awaitable[aiohttp.ClientResponse]]) -> aiohttp.ClientResponse:
+    """Like routed_request, and a GET without a response after `hedge_after` seconds is sent to the next edge as well.
+
+    The first good response wins, the other request is cancelled.
+    """
+    if edge_router is None:
+        return await send(url)
+
+    async def attempt(candidate: str) -> aiohttp.ClientResponse:
+        start = time.perf_counter_ns()
+        try:
+            response = await send(candidate)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            edge_router.record(candidate, time.perf_counter_ns() - start, False)
+            raise
+        edge_router.record(candidate, time.perf_counter_ns() - start, response.status < 500)
+        return response
+
+    candidates = iter(edge_router.candidates(url))
+    attempts = 1
+    first = next(candidates)
+    running = {asyncio.create_task(attempt(first)): first}
+    hedge = edge_router.hedge_after if method == 'GET' else None
+    try:
+        while True:
+            done, _ = await asyncio.wait(running, timeout=hedge, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # At most one hedged request, it runs concurrently with the first one
+                hedge = None
+                candidate = next(candidates, None)
+                if candidate is not None:
+                    attempts += 1
+                    running[asyncio.create_task(attempt(candidate))] = candidate
+                continue
+            for task in done:
+                candidate = running.pop(task)
+                served_edge.set((edge_router.edge(candidate), attempts))
+                error = task.exception()
+                if error is None and (task.result().status < 500 or method != 'GET'):
+                    return task.result()
+                if running:
+                    continue
+                retry = next(candidates, None) if error is None or retryable(method, error) else None
+                if retry is None:
+                    if error is not None:
+                        raise error
+                    return task.result()
+                attempts += 1
+                running[asyncio.create_task(attempt(retry))] = retry
+    finally:
+        # The losers release their connections before the session can be closed
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
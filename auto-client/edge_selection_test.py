@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+import unittest
+from types import SimpleNamespace
+
+import requests
+
+from edge_selection import EdgeRouter, routed_request, routed_request_async, set_edge_router, take_served_edge
+
+EDGES = {'e1:8005': 'http://e1:8005/crdt', 'e2:8005': 'http://e2:8005/crdt'}
+
+
+class TestEdgeSelection(unittest.TestCase):
+
+    def tearDown(self):
+        set_edge_router(None)
+
+    def test_ranks_by_latency_and_errors(self):
+        router = EdgeRouter(EDGES)
+        self.assertEqual(router.ranked(), ['http://e1:8005/crdt', 'http://e2:8005/crdt'])
+        router.record('http://e1:8005/crdt', 5_000_000, True)
+        self.assertEqual(router.ranked()[0], 'http://e2:8005/crdt')
+        router.record('http://e2:8005/crdt', 3_000_000, False)
+        self.assertEqual(router.ranked()[0], 'http://e1:8005/crdt')
+
+    def test_failover(self):
+        def run():
+            set_edge_router(EdgeRouter(EDGES))
+
+            def send(url: str):
+                if url.startswith('http://e1'):
+                    raise requests.ConnectionError('refused')
+                return SimpleNamespace(status_code=200)
+
+            self.assertEqual(routed_request('POST', 'http://e1:8005/crdt', send).status_code, 200)
+            self.assertEqual(take_served_edge(), {'edge': 'e2:8005', 'attempts': 2})
+
+            def timeout(url: str):
+                raise requests.ReadTimeout('timed out')
+
+            # A POST that timed out may have been applied, it is not sent again
+            with self.assertRaises(requests.ReadTimeout):
+                routed_request('POST', 'http://e2:8005/crdt', timeout)
+            self.assertEqual(take_served_edge(), {'edge': 'e2:8005', 'attempts': 1})
+
+        contextvars.copy_context().run(run)
+
+    def test_hedged_request(self):
+        cancelled = []
+
+        async def send(url: str):
+            try:
+                await asyncio.sleep(1.0 if url.startswith('http://e1') else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+            return SimpleNamespace(status=200, url=url)
+
+        async def run():
+            set_edge_router(EdgeRouter(EDGES, hedge_after=0.05))
+            response = await routed_request_async('GET', 'http://e1:8005/crdt', send)
+            self.assertEqual(response.url, 'http://e2:8005/crdt')
+            self.assertEqual(take_served_edge(), {'edge': 'e2:8005', 'attempts': 2})
+            # The slower request has finished its cancellation before the response is returned
+            self.assertEqual(cancelled, ['http://e1:8005/crdt'])
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
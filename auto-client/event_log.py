@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import json
+import struct
+import sys
+import threading
+from typing import BinaryIO, Iterator, TextIO
+
+import click
+
+EVENT_TYPES = ['Versioning', 'Success', 'Conflict', 'Inconsistent', 'Failure', 'Schedule']
+EVENT_TYPE_IDS = {event_type: i for i, event_type in enumerate(EVENT_TYPES)}
+
+FILE_MAGIC = b'ACEV\x01'
+NULL = -2**63
+# type, cached, not_modified, has phases, attempts, client, time, duration, total_duration, version, scheduled, session, bytes, object length,
+# event length, edge length
+RECORD_HEADER = struct.Struct('<BbbBbiqqqqqqqhhh')
+MAX_TEXT_LENGTH = 32767
+# Only records with request phase timings carry them, after the header
+PHASES = ['connect', 'ttfb', 'transfer', 'decode', 'think']
+RECORD_PHASES = struct.Struct('<qqqqq')
+
+
+class JsonLinesSink:
+    stream: TextIO
+
+    def __init__(self, stream: TextIO = None):
+        self.stream = stream or sys.stdout
+
+    def write(self, record: dict):
+        print(json.dumps(record), file=self.stream)
+
+    def close(self):
+        self.stream.flush()
+
+
+class NullSink:
+
+    def write(self, record: dict):
+        pass
+
+    def close(self):
+        pass
+
+
+class BinarySink:
+    stream: BinaryIO
+    batch_size: int
+    flush_interval: float
+
+    def __init__(self, stream: BinaryIO, batch_size: int = 4096, flush_interval: float = 1.0):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batch = []
+        self.lock = threading.Lock()
+        self.batch_full = threading.Event()
+        self.closed = False
+        self.stream.write(FILE_MAGIC)
+        self.flush_thread = threading.Thread(target=self.flush_loop, daemon=True)
+        self.flush_thread.start()
+
+    def write(self, record: dict):
+        encoded = encode_record(record)
+        with self.lock:
+            self.batch.append(encoded)
+            batch_length = len(self.batch)
+        if batch_length >= self.batch_size:
+            self.batch_full.set()
+
+    def flush_loop(self):
+        while not self.closed:
+            self.batch_full.wait(self.flush_interval)
+            self.batch_full.clear()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch, self.batch = self.batch, []
+        if batch:
+            self.stream.write(b''.join(batch))
+            self.stream.flush()
+
+    def close(self):
+        self.closed = True
+        self.batch_full.set()
+        self.flush_thread.join()
+        self.flush()
+
+
+def optional(value) -> int:
+    return NULL if value is None else value
+
+
+def encode_text(text: str) -> bytes:
+    # Longer texts are cut, without splitting a multi-byte character
+    return text.encode()[:MAX_TEXT_LENGTH].decode(errors='ignore').encode()
+
+
+def encode_record(record: dict) -> bytes:
+    """Packs a record of the JSON-lines log, the object is always stored and read back as a string."""
+    cached = record.get('cached')
+    not_modified = record.get('not_modified')
+    event_object = record.get('object')
+    event_object = b'' if event_object is None else encode_text(str(event_object))
+    event = record.get('event')
+    event = b'' if event is None else encode_text(event)
+    edge = record.get('edge')
+    edge = b'' if edge is None else encode_text(edge)
+    has_phases = 'connect' in record
+    phases = RECORD_PHASES.pack(*[optional(record.get(phase)) for phase in PHASES]) if has_phases else b''
+    return RECORD_HEADER.pack(
+        EVENT_TYPE_IDS[record['type']],
+        -1 if cached is None else int(cached),
+        -1 if not_modified is None else int(not_modified),
+        int(has_phases),
+        min(record.get('attempts', -1), 127),
+        record.get('client', -1),
+        record['time'],
+        optional(record.get('duration', record.get('lag'))),
+        optional(record.get('total_duration')),
+        optional(record.get('version')),
+        optional(record.get('scheduled')),
+        optional(record.get('session')),
+        optional(record.get('bytes')),
+        -1 if 'object' not in record else len(event_object),
+        -1 if 'event' not in record else len(event),
+        -1 if 'edge' not in record else len(edge),
+    ) + phases + event_object + event + edge
+
+
+def read_records(stream: BinaryIO) -> Iterator[dict]:
+    if stream.read(len(FILE_MAGIC)) != FILE_MAGIC:
+        raise ValueError('Not an auto-client binary event log')
+    data = stream.read()
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        (event_type, cached, not_modified, has_phases, attempts, client, time, duration, total_duration, version, scheduled, session, size, object_length,
+         event_length, edge_length) = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        phases = {}
+        if has_phases:
+            phases = {phase: value for phase, value in zip(PHASES, RECORD_PHASES.unpack_from(data, offset)) if value != NULL}
+            offset += RECORD_PHASES.size
+        event_object = None
+        if object_length >= 0:
+            event_object = data[offset:offset + object_length].decode()
+            offset += object_length
+        event = None
+        if event_length >= 0:
+            event = data[offset:offset + event_length].decode(errors='backslashreplace')
+            offset += event_length
+        edge = None
+        if edge_length >= 0:
+            edge = data[offset:offset + edge_length].decode()
+            offset += edge_length
+
+        # Rebuild the records with the same keys and key order as the JSON-lines log
+        event_type = EVENT_TYPES[event_type]
+        if event_type == 'Versioning':
+            record = {'type': event_type, 'time': time, 'object': event_object, 'version': version, 'duration': duration, 'cached': None if cached < 0 else bool(cached)}
+            if size != NULL:
+                record['bytes'] = size
+            if not_modified >= 0:
+                record['not_modified'] = bool(not_modified)
+        elif event_type == 'Schedule':
+            record = {'type': event_type, 'time': time, 'session': session, 'scheduled': scheduled, 'lag': duration}
+        else:
+            record = {'type': event_type, 'event': event, 'time': time, 'duration': duration, 'total_duration': total_duration}
+            if event_object is not None:
+                record['object'] = event_object
+        record.update(phases)
+        if edge is not None:
+            record['edge'] = edge
+        if attempts >= 0:
+            record['attempts'] = attempts
+        if client >= 0:
+            record['client'] = client
+        yield record
+
+
+@click.command()
+@click.argument('binary_log', type=click.File('rb'))
+@click.argument('json_log', type=click.File('w'), default='-')
+def main(binary_log: BinaryIO, json_log):
+    """Converts a binary auto-client event log back into the JSON-lines log format."""
+    for record in read_records(binary_log):
+        json_log.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import io
+import unittest
+
+from event_log import BinarySink, read_records
+
+
+class TestBinaryEventLog(unittest.TestCase):
+
+    def test_round_trip(self):
+        records = [
+            {'type': 'Versioning', 'time': 1700000000000000000, 'object': 'flight_3', 'version': 7, 'duration': 2500000, 'cached': True},
+            {'type': 'Versioning', 'time': 1700000000000000001, 'object': 'forums', 'version': 0, 'duration': 2500000, 'cached': None, 'client': 4},
+            {'type': 'Versioning', 'time': 1700000000000000001, 'object': 'forum_2', 'version': 3, 'duration': 900000, 'cached': True, 'bytes': 0, 'not_modified': True, 'client': 4},
+            {'type': 'Success', 'event': 'booked seat 81 True', 'time': 1700000000000000002, 'duration': 10, 'total_duration': 30},
+            {'type': 'Versioning', 'time': 1700000000000000002, 'object': 'flight_4', 'version': 1, 'duration': 80, 'cached': False, 'bytes': 812,
+             'connect': 12, 'ttfb': 40, 'transfer': 8, 'decode': 20, 'think': 5000, 'client': 1},
+            {'type': 'Success', 'event': 'booked seat 12 True', 'time': 1700000000000000002, 'duration': 10, 'total_duration': 30, 'connect': 0, 'ttfb': 7},
+            {'type': 'Versioning', 'time': 1700000000000000003, 'object': 'flights', 'version': 2, 'duration': 70, 'cached': True, 'bytes': 90,
+             'edge': '10.2.0.1:8005', 'attempts': 2, 'client': 3},
+            {'type': 'Failure', 'event': 'error timed out', 'time': 1700000000000000003, 'duration': 10, 'total_duration': 30, 'edge': '10.1.0.1:8005', 'attempts': 1},
+            {'type': 'Inconsistent', 'event': 'Outdated information {}', 'time': 1700000000000000003, 'duration': 10, 'total_duration': 30, 'object': 'flights'},
+            {'type': 'Schedule', 'time': 1700000000000000004, 'session': 3, 'scheduled': 1700000000000000000, 'lag': 4, 'client': 2},
+        ]
+        stream = io.BytesIO()
+        sink = BinarySink(stream, batch_size=2)
+        for record in records:
+            sink.write(record)
+        sink.close()
+
+        stream.seek(0)
+        self.assertEqual(list(read_records(stream)), records)
+
+    def test_long_text_and_object_type(self):
+        stream = io.BytesIO()
+        sink = BinarySink(stream)
+        sink.write({'type': 'Inconsistent', 'event': 'a' + 'ü' * 20000, 'time': 1, 'duration': 2, 'total_duration': 3, 'object': 52})
+        sink.close()
+
+        stream.seek(0)
+        record, = read_records(stream)
+        self.assertEqual(record['event'], 'a' + 'ü' * 16383)
+        self.assertEqual(record['object'], '52')
+
+
+if __name__ == '__main__':
+    unittest.main()
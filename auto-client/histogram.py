@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable, TextIO, Tuple
+
+import click
+
+# Each power of two is split into SUB_BUCKETS log-spaced buckets, so a bucket is at most ~1.6% wide
+SUB_BUCKETS = 64
+
+HistogramKey = Tuple[str, str, bool]
+
+
+def bucket_index(value: int) -> int:
+    mantissa, exponent = math.frexp(max(value, 1))
+    return exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+
+def bucket_value(index: int) -> float:
+    exponent, sub_bucket = divmod(index, SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub_bucket + 0.5) / (2 * SUB_BUCKETS), exponent)
+
+
+class LatencyHistogram:
+    counts: dict[int, int]
+    total: int
+    sum: int
+
+    def __init__(self, counts: dict[int, int] = None):
+        self.counts = defaultdict(int, counts or {})
+        self.total = sum(self.counts.values())
+        self.sum = 0
+
+    def record(self, value: int):
+        self.counts[bucket_index(value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in other.counts.items():
+            self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+
+    def percentile(self, q: float) -> float:
+        if self.total == 0:
+            return math.nan
+        rank = q * self.total
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return bucket_value(index)
+        return bucket_value(max(self.counts))
+
+    def to_dict(self) -> dict:
+        return {'count': self.total, 'sum': self.sum, 'buckets': sorted(self.counts.items())}
+
+    @classmethod
+    def from_dict(cls, summary: dict) -> 'LatencyHistogram':
+        histogram = cls(dict(summary['buckets']))
+        histogram.sum = summary['sum']
+        return histogram
+
+
+class HistogramRecorder:
+    """Collects latencies per (event type, object, cached) and writes the histograms of each interval."""
+    stream: TextIO
+    interval: float
+    histograms: dict[HistogramKey, LatencyHistogram]
+
+    def __init__(self, stream: TextIO, interval: float = 1.0, client_number: int = None):
+        self.stream = stream
+        self.interval = interval
+        self.client_number = client_number
+        self.histograms = defaultdict(LatencyHistogram)
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.interval_start = time.time_ns()
+        self.emit_thread = threading.Thread(target=self.emit_loop, daemon=True)
+        self.emit_thread.start()
+
+    def record(self, event: str, event_object: str, cached: bool, duration: int):
+        with self.lock:
+            self.histograms[(event, event_object, cached)].record(duration)
+
+    def emit_loop(self):
+        while not self.closed.wait(self.interval):
+            self.emit()
+
+    def emit(self, final: bool = False):
+        with self.lock:
+            histograms, self.histograms = self.histograms, defaultdict(LatencyHistogram)
+        interval_start, self.interval_start = self.interval_start, time.time_ns()
+        for (event, event_object, cached), histogram in histograms.items():
+            summary = {'type': 'Histogram', 'time': self.interval_start, 'interval_start': interval_start, 'event': event, 'object': event_object, 'cached': cached}
+            if self.client_number is not None:
+                summary['client'] = self.client_number
+            if final:
+                summary['final'] = True
+            summary.update(histogram.to_dict())
+            self.stream.write(json.dumps(summary) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        self.closed.set()
+        self.emit_thread.join()
+        self.emit(final=True)
+
+
+def read_summaries(files: Iterable[TextIO]) -> Iterable[dict]:
+    for file in files:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+@click.command()
+@click.argument('histogram_files', type=click.File('r'), nargs=-1, required=True)
+@click.option('--group-by', type=click.Choice(['event', 'object', 'cached']), multiple=True, default=['event', 'cached'])
+def main(histogram_files: list[TextIO], group_by: list[str]):
+    """Merges the per-client histogram summaries into experiment-wide latency percentiles (in ms)."""
+    merged: dict[tuple, LatencyHistogram] = defaultdict(LatencyHistogram)
+    for summary in read_summaries(histogram_files):
+        merged[tuple(summary[column] for column in group_by)].merge(LatencyHistogram.from_dict(summary))
+
+    for key, histogram in sorted(merged.items(), key=lambda item: str(item[0])):
+        result = dict(zip(group_by, key))
+        result.update({
+            'count': histogram.total,
+            'mean': histogram.sum / histogram.total / 10**6,
+            'p50': histogram.percentile(0.5) / 10**6,
+            'p99': histogram.percentile(0.99) / 10**6,
+            'p999': histogram.percentile(0.999) / 10**6,
+        })
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import unittest
+
+from histogram import LatencyHistogram
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_percentiles_within_bucket_precision(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 100001):
+            histogram.record(value * 1000)
+        self.assertAlmostEqual(histogram.percentile(0.5), 50000 * 1000, delta=50000 * 1000 * 0.01)
+        self.assertAlmostEqual(histogram.percentile(0.99), 99000 * 1000, delta=99000 * 1000 * 0.01)
+
+    def test_merge_round_trip(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 1000):
+            first.record(value)
+            second.record(value * 10)
+        merged = LatencyHistogram.from_dict(first.to_dict())
+        merged.merge(LatencyHistogram.from_dict(second.to_dict()))
+        self.assertEqual(merged.total, 1998)
+        self.assertEqual(merged.sum, first.sum + second.sum)
+        self.assertGreater(merged.percentile(0.999), first.percentile(0.999))
+
+
+if __name__ == '__main__':
+    unittest.main()
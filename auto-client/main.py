@@ -1,22 +1,30 @@
 #!/usr/bin/env python3
 
-import json
 import logging
 import random
 import select
 import signal
-import string
 import sys
 import time
 from json import JSONDecodeError
-from typing import Dict
 
 import click
+import numpy as np
 import requests
 import validators
-import numpy as np
 from requests import Response
 
+from async_engine import run_async_engine
+from client_log import log_event, log_request_start, log_version, log_schedule, set_event_sink, close_event_sink, set_histogram_recorder, close_histogram_recorder
+from decoding import flight_listing, forum_listing, free_seats, meta_only
+from edge_selection import EdgeRouter, routed_timeout, routed_request, session_url, set_edge_router
+from event_log import BinarySink, JsonLinesSink, NullSink
+from histogram import HistogramRecorder
+from phase_timing import begin_request, enable_phase_timing, timed_request
+from revalidation import decode_response, enable_revalidation, revalidation_headers
+from request_trace import TraceEntry, TraceRecorder, close_trace_recorder, log_replayed_response, read_trace, record_request, set_trace_recorder
+from workload import ClientWorkload, DEFAULT_POPULARITY, arrival_rng, arrival_timeline, load_workload_file, make_sampler
+
 interrupted = False
 random.seed(42)
 
@@ -26,67 +34,116 @@ def signal_handler(sig, frame):
     global interrupted
     interrupted = True
 
+def validate_popularity(ctx, param, value: str):
+    if value is not None:
+        # Building the sampler and drawing once also catches parameters that only fail while sampling
+        try:
+            make_sampler(value, np.random.default_rng())(1)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return value
+
+
 @click.command()
 @click.option('--api', type=click.Choice(['flights', 'forums']), required=True)
-@click.option('--mode', type=click.Choice(['proxy', 'cache', 'ttl', 'crdt']), required=True)
-@click.option('--edge-server', type=str, required=True)
+@click.option('--mode', type=click.Choice(['proxy', 'cache', 'ttl', 'crdt', 'revalidate']), required=True)
+@click.option('--edge-server', type=str, required=True, help='host:port of the edge, or a comma separated list of edges to route the sessions between')
 @click.option('--client-number', default=1, type=click.IntRange(min=0), required=False)
-@click.option('--test', type=click.IntRange(min=0), required=False)
-def main(api: str, mode: str, edge_server: str, test: int, client_number: int):
+@click.option('--test', type=click.IntRange(min=0), required=False, help='Stop after this many sessions of every (virtual) client')
+@click.option('--engine', type=click.Choice(['sync', 'async']), default='sync')
+@click.option('--virtual-clients', type=click.IntRange(min=1), default=1, help='Number of clients run by the async engine, numbered from --client-number')
+@click.option('--rate', type=click.FloatRange(min=0, min_open=True), required=False, help='Open-loop mode: sessions started per second, independent of response times')
+@click.option('--arrival', type=click.Choice(['poisson', 'constant']), default='poisson')
+@click.option('--log-format', type=click.Choice(['json', 'binary', 'none']), default='json', help='binary logs are batched and can be converted with event_log.py')
+@click.option('--log-file', type=click.Path(dir_okay=False), default='-')
+@click.option('--histogram-file', type=click.Path(dir_okay=False), required=False, help='Write latency histograms per interval, merge them with histogram.py')
+@click.option('--histogram-interval', type=click.FloatRange(min=0, min_open=True), default=1.0)
+@click.option('--popularity', type=str, required=False, callback=validate_popularity,
+              help='Popularity of flights/forums: uniform, normal:mu=20,sigma=30, zipf:s=1.1 or hotspot:fraction=0.1,probability=0.9,shift=10000')
+@click.option('--seed', type=int, required=False)
+@click.option('--workload-file', type=click.Path(exists=True, dir_okay=False), required=False, help='JSON file with popularity and seed, overridden by the options')
+@click.option('--record-trace', type=click.Path(dir_okay=False), required=False, help='Record all requests into a trace that can be replayed with --replay-trace')
+@click.option('--replay-trace', type=click.Path(exists=True, dir_okay=False), required=False)
+@click.option('--replay-speed', type=click.FloatRange(min=0), default=1.0, help='Replay speed factor, 0 replays as fast as possible')
+@click.option('--start-at', type=int, required=False, help='Wall clock time in ns at which the client starts its first session')
+@click.option('--phase-timing', is_flag=True, default=False, help='Log connect, ttfb, transfer, decode and think time of every request')
+@click.option('--request-timeout', type=click.FloatRange(min=0, min_open=True), required=False, help='Seconds until a request to one of several edges fails over to the next')
+@click.option('--hedge-after', type=click.FloatRange(min=0, min_open=True), required=False, help='Seconds until a GET is also sent to the next best edge, with --engine async')
+def main(api: str, mode: str, edge_server: str, test: int, client_number: int, engine: str, virtual_clients: int, rate: float, arrival: str,
+         log_format: str, log_file: str, histogram_file: str, histogram_interval: float, popularity: str, seed: int, workload_file: str,
+         record_trace: str, replay_trace: str, replay_speed: float, start_at: int, phase_timing: bool, request_timeout: float, hedge_after: float):
     signal.signal(signal.SIGINT, signal_handler)
-    run_autonomous_client(api, mode, edge_server, test, client_number)
+    if ',' not in edge_server and (request_timeout is not None or hedge_after is not None):
+        raise click.BadParameter('failover and hedging need several edges', param_hint='--edge-server')
+    if hedge_after is not None and engine != 'async':
+        raise click.BadParameter('hedged requests need --engine async', param_hint='--hedge-after')
+    workload_config = load_workload_file(workload_file) if workload_file else {}
+    popularity = validate_popularity(None, None, popularity or workload_config.get('popularity'))
+    seed = seed if seed is not None else workload_config.get('seed', 42)
+    run_autonomous_client(api, mode, edge_server, test, client_number, engine, virtual_clients, rate, arrival, log_format, log_file,
+                          histogram_file, histogram_interval, popularity, seed, record_trace, replay_trace, replay_speed, phase_timing, start_at,
+                          request_timeout, hedge_after)
+
+
+def send_request(method: str, edge_server_url: str, path: str, headers: dict, json_body: dict = None) -> Response:
+    log_request_start()
+    record_request(method, path, json_body)
+    headers = revalidation_headers(method, path, headers)
+
+    def send(url: str) -> Response:
+        if begin_request():
+            return timed_request(method, f'{url}{path}', headers=headers, json=json_body, timeout=routed_timeout())
+        return requests.request(method, f'{url}{path}', headers=headers, json=json_body, timeout=routed_timeout())
 
+    return routed_request(method, edge_server_url, send)
 
-def run_flights_client(edge_server_url: str, headers: dict, runs: int):
-    start_time = time.time_ns()
+
+def run_flights_client(edge_server_url: str, headers: dict, runs: int, workload: ClientWorkload, scheduled_time: int = None):
+    start_time = scheduled_time or time.time_ns()
     last_query_time = start_time
 
     try:
         # 1 Get flights
-        flightsRequest = requests.get(f'{edge_server_url}/flights', headers=headers)
-        flights = flightsRequest.json()
+        flightsRequest = send_request('GET', edge_server_url, '/flights', headers)
+        flights = decode_response('/flights', flightsRequest, flight_listing)
         if not flightsRequest.ok:
             log_event('Inconsistent', f'Outdated information {flights}', last_query_time, start_time, object='flights')
             return
 
         log_version(flights["meta"], flightsRequest, last_query_time)
 
-        if type(flights["data"]) is dict:
-            flight_list = list(flights['data'].values())
-            my_flight_choice = flight_list[make_flight_choice()]
-        else:
-            my_flight_choice = flights['data'][make_flight_choice()]
+        my_flight_number = flights['items'][workload.item_choice()]
 
         # Get concrete flight plan
         last_query_time = time.time_ns()
-        flightDetailsUrl = f'{edge_server_url}/flights/{my_flight_choice["number"]}'
-        flightDetailRequest = requests.get(flightDetailsUrl, headers=headers)
-        flightDetails = flightDetailRequest.json()
+        flightDetailsPath = f'/flights/{my_flight_number}'
+        flightDetailRequest = send_request('GET', edge_server_url, flightDetailsPath, headers)
+        flightDetails = decode_response(flightDetailsPath, flightDetailRequest, free_seats)
         if not flightDetailRequest.ok:
             log_event('Inconsistent', f'Outdated information {flightDetails}', last_query_time, start_time,
-                      object=f'flight_{my_flight_choice["number"]}')
+                      object=f'flight_{my_flight_number}')
             return
 
         log_version(flightDetails["meta"], flightDetailRequest, last_query_time)
 
         # Select a seat
-        available_seats = [seat['number'] for seat in flightDetails['data']['seatingPlan'].values() if not seat['booked']]
+        available_seats = flightDetails['available_seats']
 
         if len(available_seats) == 0:
             log_event('Conflict', f'seatPlan empty', last_query_time, start_time)
             return
 
-        chosen_seat = random.choice(available_seats)
+        chosen_seat = workload.seat_choice(available_seats)
 
         # Book the seat
         last_query_time = time.time_ns()
-        result = requests.post(f'{flightDetailsUrl}/book/{chosen_seat}', headers=headers)
-        resultJson = result.json()
+        result = send_request('POST', edge_server_url, f'{flightDetailsPath}/book/{chosen_seat}', headers)
+        resultJson = decode_response(f'{flightDetailsPath}/book/{chosen_seat}', result)
         if result.ok:
             log_event('Success', f'booked seat {chosen_seat} {resultJson["success"]}', last_query_time, start_time)
         elif result.status_code == 404:
             log_event('Inconsistent', f'Outdated information {flightDetails}', last_query_time, start_time,
-                      object=f'flight_{my_flight_choice["number"]}')
+                      object=f'flight_{my_flight_number}')
         else:
             log_event('Conflict', f'Error booking seat {chosen_seat}: {resultJson}', last_query_time, start_time)
 
@@ -99,31 +156,27 @@ def run_flights_client(edge_server_url: str, headers: dict, runs: int):
         time.sleep(0.01 + random.random())
 
 
-def run_forum_client(edge_server_url: str, headers: dict, runs: int):
-    start_time = time.time_ns()
+def run_forum_client(edge_server_url: str, headers: dict, runs: int, workload: ClientWorkload, scheduled_time: int = None):
+    start_time = scheduled_time or time.time_ns()
     last_query_time = start_time
     try:
         # 1 Get all Forums
-        forumRequest = requests.get(f'{edge_server_url}/forums', headers=headers)
-        forums = forumRequest.json()
+        forumRequest = send_request('GET', edge_server_url, '/forums', headers)
+        forums = decode_response('/forums', forumRequest, forum_listing)
         if not forumRequest.ok:
             log_event('Inconsistent', f'Outdated information {forums["errors"]}', last_query_time, start_time, object='forums')
             return
 
         log_version(forums["meta"], forumRequest, last_query_time)
 
-        my_forum_int_choice = random.randint(0, 99)
-        if type(forums["data"]) is dict:
-            forum_list = list(forums['data'].values())
-            my_forum_choice = forum_list[my_forum_int_choice]
-        else:
-            my_forum_choice = forums['data'][my_forum_int_choice]
+        my_forum_int_choice = workload.item_choice()
+        my_forum_id = forums['items'][my_forum_int_choice]
 
         # Get concrete forum
         last_query_time = time.time_ns()
-        forumDetailsUrl = f'{edge_server_url}/forums/{my_forum_choice["id"]}'
-        forumDetailRequest = requests.get(forumDetailsUrl, headers=headers)
-        forumDetails = forumDetailRequest.json()
+        forumDetailsPath = f'/forums/{my_forum_id}'
+        forumDetailRequest = send_request('GET', edge_server_url, forumDetailsPath, headers)
+        forumDetails = decode_response(forumDetailsPath, forumDetailRequest, meta_only)
         if not forumDetailRequest.ok:
             log_event('Failure', f'Not found {forumDetails["errors"]}', last_query_time, start_time,
                       object=f'forum_{my_forum_int_choice}')
@@ -134,9 +187,9 @@ def run_forum_client(edge_server_url: str, headers: dict, runs: int):
         # Post a message
         post = runs % 5 == 0
         if post:
-            forumPost = ''.join(random.choices(string.ascii_lowercase, k=25))
-            result = requests.post(forumDetailsUrl, headers=headers, json={ 'message': forumPost })
-            resultJson = result.json()
+            forumPost = workload.post_message()
+            result = send_request('POST', edge_server_url, forumDetailsPath, headers, { 'message': forumPost })
+            resultJson = decode_response(forumDetailsPath, result)
             if result.ok:
                 log_event('Success', f'posted message', last_query_time, start_time)
             else:
@@ -153,65 +206,156 @@ def run_forum_client(edge_server_url: str, headers: dict, runs: int):
         # time.sleep(5)
 
 
-def run_autonomous_client(api: str, mode: str, edge_server: str, test: int, client_number: int):
-    logging.basicConfig(level=logging.INFO)
-    logging.info(f'Starting Auto-Client {client_number} on API {api} with mode {mode}. Connecting to {edge_server}.')
-    headers = None
-    if mode == 'ttl':
-        headers = { 'no-invalidation': 'True' }
-        mode = 'cache'
+def poll_interrupted() -> bool:
+    global interrupted
+    if select.select([sys.stdin, ], [], [], 0.0)[0]:
+        readline = sys.stdin.readline().strip()
+        if 'CLOSE' in readline:
+            print('Received CLOSE input', file=sys.stderr, flush=True)
+            interrupted = True
+    return interrupted
+
+
+def wait_until(scheduled_time: int):
+    while not interrupted:
+        wait = (scheduled_time - time.time_ns()) / 10**9
+        if wait <= 0:
+            return
+        time.sleep(min(wait, 0.1))
+        poll_interrupted()
+
 
-    edge_server_url = f'http://{edge_server}/{mode}'
-    validators.url(edge_server_url)
+def run_open_loop_client(api: str, edge_server_url: str, headers: dict, test: int, workload: ClientWorkload, rate: float, arrival: str, seed: int, client_number: int):
+    # Sessions that start late are still measured from their scheduled time (coordinated omission)
+    n = 0
+    timeline_start = time.time_ns()
+    for offset in arrival_timeline(rate, arrival, arrival_rng(seed, client_number)):
+        if interrupted or (test is not None and n >= test):
+            break
+        n += 1
+
+        scheduled_time = timeline_start + offset
+        wait_until(scheduled_time)
+        poll_interrupted()
+        log_schedule(n, scheduled_time)
+
+        if api == 'flights':
+            run_flights_client(session_url(edge_server_url), headers, n, workload, scheduled_time)
+        elif api == 'forums':
+            run_forum_client(session_url(edge_server_url), headers, n, workload, scheduled_time)
+
+
+def run_closed_loop_client(api: str, edge_server_url: str, headers: dict, test: int, workload: ClientWorkload):
     n = 0
-    global interrupted
     while not interrupted:
         if test is not None:
             if n >= test:
                 break
         n += 1
 
-        if select.select([sys.stdin, ], [], [], 0.0)[0]:
-            readline = sys.stdin.readline().strip()
-            if 'CLOSE' in readline:
-                print('Received CLOSE input', file=sys.stderr, flush=True)
-                interrupted = True
+        poll_interrupted()
 
         if api == 'flights':
-            run_flights_client(edge_server_url, headers, n)
+            run_flights_client(session_url(edge_server_url), headers, n, workload)
         elif api == 'forums':
-            run_forum_client(edge_server_url, headers, n)
+            run_forum_client(session_url(edge_server_url), headers, n, workload)
 
-def log_event(event: str, details: str, start_time: int, total_start_time: int, object: str = None):
-    curr_time = time.time_ns()
-    duration = curr_time - start_time
-    total_duration = curr_time - total_start_time
-    log_msg = {'type': event, 'event': details, 'time': time.time_ns(), 'duration': duration, 'total_duration': total_duration}
-    if object is not None:
-        log_msg['object'] = object
-    print(json.dumps(log_msg))
+
+def replay_request(edge_server_url: str, headers: dict, entry: TraceEntry, start_time: int):
+    try:
+        response = send_request(entry.method, edge_server_url, entry.path, headers, entry.body)
+        log_replayed_response(entry, response, response.status_code, decode_response(entry.path, response), start_time)
+    except Exception as e:
+        logging.error(f'Exception occurred: {e}', exc_info=e)
+        log_event('Failure', f'error {e}', start_time, start_time)
 
 
-def log_version(meta: Dict, response: Response, start_time: int):
+def run_replay_client(edge_server_url: str, headers: dict, test: int, replay_trace: str, replay_speed: float):
+    # A speed of 0 replays as fast as possible, otherwise requests are measured from their scheduled time
+    n = 0
+    replay_start = time.time_ns()
+    for entry in read_trace(replay_trace):
+        if interrupted or (test is not None and n >= test):
+            break
+        n += 1
+
+        if replay_speed > 0:
+            scheduled_time = replay_start + int(entry.offset / replay_speed)
+            wait_until(scheduled_time)
+        else:
+            scheduled_time = time.time_ns()
+        poll_interrupted()
+
+        replay_request(session_url(edge_server_url), headers, entry, scheduled_time)
+
+
+def run_autonomous_client(api: str, mode: str, edge_server: str, test: int, client_number: int, engine: str = 'sync', virtual_clients: int = 1,
+                          rate: float = None, arrival: str = 'poisson', log_format: str = 'json', log_file: str = '-',
+                          histogram_file: str = None, histogram_interval: float = 1.0, popularity: str = None, seed: int = 42,
+                          record_trace: str = None, replay_trace: str = None, replay_speed: float = 1.0, phase_timing: bool = False,
+                          start_at: int = None, request_timeout: float = None, hedge_after: float = None):
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f'Starting Auto-Client {client_number} on API {api} with mode {mode}. Connecting to {edge_server}.')
+    headers = None
+    if mode == 'ttl':
+        headers = { 'no-invalidation': 'True' }
+        mode = 'cache'
+    elif mode == 'revalidate':
+        # The cache mode of the edge with conditional requests, unchanged objects come back as 304 without a body.
+        # Only requests with this header get an ETag from the edge, so the first request of an object gets one too
+        headers = { 'revalidate': 'True' }
+        enable_revalidation()
+        mode = 'cache'
+
+    edge_urls = {edge: f'http://{edge}/{mode}' for edge in edge_server.split(',')}
+    for url in edge_urls.values():
+        validators.url(url)
+    edge_server_url = next(iter(edge_urls.values()))
+    if len(edge_urls) > 1:
+        # Sessions go to the edge with the lowest latency and error estimate, shared by all virtual clients
+        set_edge_router(EdgeRouter(edge_urls, request_timeout, hedge_after, seed + client_number))
+
+    if log_format == 'binary':
+        set_event_sink(BinarySink(sys.stdout.buffer if log_file == '-' else open(log_file, 'wb')))
+    elif log_format == 'none':
+        set_event_sink(NullSink())
+    elif log_file != '-':
+        set_event_sink(JsonLinesSink(open(log_file, 'w')))
+
+    popularity = popularity or DEFAULT_POPULARITY[api]
+    make_workload = lambda number: ClientWorkload(popularity, seed, number)
+    workload = make_workload(client_number)
+
+    if histogram_file is not None:
+        set_histogram_recorder(HistogramRecorder(open(histogram_file, 'w'), histogram_interval, client_number))
+
+    if record_trace is not None:
+        set_trace_recorder(TraceRecorder(open(record_trace, 'wb')))
+
+    if phase_timing:
+        enable_phase_timing()
+
+    if start_at is not None:
+        # Clients of a distributed fleet start together, the coordinator already translated the time into our clock
+        wait_until(start_at)
+
     try:
-        cached = None
-        cachedHeader = response.headers.get('X-Cached')
-        if cachedHeader:
-            cached = cachedHeader == 'true'
-        duration = time.time_ns() - start_time
-        log_msg = { 'type': 'Versioning', 'time': time.time_ns(), 'object': meta['id'], 'version': meta['version'], 'duration': duration, 'cached': cached }
-        print(json.dumps(log_msg))
-    except Exception as err:
-        logging.exception(f'Exception during logging version {err}', exc_info=err)
-        raise err
-
-
-def make_flight_choice() -> int:
-    s = -1
-    mu, sigma = 20, 30
-    while s < 0 or s >= 100:
-        s = int(np.random.normal(mu, sigma))
-    return s
+        if engine == 'async':
+            logging.info(f'Running {virtual_clients} virtual clients starting at {client_number}')
+            run_async_engine(api, edge_server_url, headers, test, client_number, virtual_clients, poll_interrupted, make_workload, rate, arrival,
+                             replay_trace, replay_speed, seed)
+        elif replay_trace is not None:
+            logging.info(f'Replaying {replay_trace} at speed {replay_speed}')
+            run_replay_client(edge_server_url, headers, test, replay_trace, replay_speed)
+        elif rate is not None:
+            logging.info(f'Running open loop with {arrival} arrivals at {rate} sessions/s')
+            run_open_loop_client(api, edge_server_url, headers, test, workload, rate, arrival, seed, client_number)
+        else:
+            run_closed_loop_client(api, edge_server_url, headers, test, workload)
+    finally:
+        close_trace_recorder()
+        close_histogram_recorder()
+        close_event_sink()
 
 
 if __name__ == '__main__':
@@ -1,35 +1,81 @@
-
-
+import contextvars
 import unittest
 
+import client_log
 from main import run_autonomous_client
+from stub_edge import StubEdgeServer
+
+
+class CollectingSink:
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record: dict):
+        self.records.append(record)
+
+    def close(self):
+        pass
 
 
 class TestAutonomousClient(unittest.TestCase):
 
-    def test_flights_proxy(self):
-        run_autonomous_client('flights', 'proxy', 'localhost:8005', 20, 1)
+    def run_client(self, api: str, mode: str, test: int, *args, **kwargs) -> list[dict]:
+        # Every run starts with empty client state, e.g. the validator cache of the revalidate mode
+        sink = CollectingSink()
+        client_log.set_event_sink(sink)
+        with StubEdgeServer() as server:
+            contextvars.copy_context().run(run_autonomous_client, api, mode, server.address, test, 1, *args, **kwargs)
+        self.assertEqual([record for record in sink.records if record['type'] in ('Failure', 'Inconsistent')], [])
+        return sink.records
 
-    def test_flights_cache(self):
-        run_autonomous_client('flights', 'cache', 'localhost:8005', 20, 1)
+    def assert_sessions(self, records: list[dict], sessions: int):
+        # Every session logs the version of the listing and of one flight or forum
+        self.assertEqual(sum(1 for record in records if record['type'] == 'Versioning'), 2 * sessions)
 
-    def test_flights_ttl_cache(self):
-        run_autonomous_client('flights', 'ttl', 'localhost:8005', 20, 1)
+    def test_flights_modes(self):
+        for mode in ['proxy', 'cache', 'ttl', 'crdt', 'revalidate']:
+            with self.subTest(mode=mode):
+                records = self.run_client('flights', mode, 5)
+                self.assert_sessions(records, 5)
+                self.assertEqual(sum(1 for record in records if record['type'] in ('Success', 'Conflict')), 5)
 
-    def test_flights_crdt(self):
-        run_autonomous_client('flights', 'crdt', 'localhost:8005', 20, 1)
+    def test_forum_modes(self):
+        for mode in ['proxy', 'cache', 'ttl', 'crdt', 'revalidate']:
+            with self.subTest(mode=mode):
+                self.assert_sessions(self.run_client('forums', mode, 5), 5)
 
-    def test_forum_proxy(self):
-        run_autonomous_client('forums', 'proxy', 'localhost:8005', 20, 1)
+    def test_revalidate_not_modified(self):
+        records = self.run_client('forums', 'revalidate', 5)
+        # The forum listing only changes with the post of the fifth session
+        self.assertEqual([record.get('not_modified', False) for record in records if record['type'] == 'Versioning' and record['object'] == 'forums'],
+                         [False, True, True, True, True])
 
-    def test_forum_cache(self):
-        run_autonomous_client('forums', 'cache', 'localhost:8005', 20, 1)
+    def test_async_engine(self):
+        for api in ['flights', 'forums']:
+            with self.subTest(api=api):
+                records = self.run_client(api, 'crdt', 3, 'async', 4)
+                self.assert_sessions(records, 12)
+                self.assertEqual({record['client'] for record in records}, {1, 2, 3, 4})
 
-    def test_forum_ttl_cache(self):
-        run_autonomous_client('forums', 'ttl', 'localhost:8005', 20)
+    def test_open_loop(self):
+        records = self.run_client('flights', 'cache', 4, rate=200, arrival='constant')
+        self.assert_sessions(records, 4)
+        self.assertEqual([record['session'] for record in records if record['type'] == 'Schedule'], [1, 2, 3, 4])
 
-    def test_forum_crdt(self):
-        run_autonomous_client('forums', 'crdt', 'localhost:8005', 20)
+    def test_open_loop_async_engine(self):
+        # --test counts the sessions of every virtual client, like in the closed loop
+        records = self.run_client('forums', 'revalidate', 3, 'async', 4, rate=200, arrival='poisson')
+        self.assert_sessions(records, 12)
+        self.assertEqual(sum(1 for record in records if record['type'] == 'Schedule'), 12)
+        # Each virtual client keeps its validators over its sessions
+        not_modified = {}
+        for record in records:
+            if record['type'] == 'Versioning' and record['object'] == 'forums':
+                not_modified.setdefault(record['client'], []).append(record.get('not_modified', False))
+        self.assertEqual(sorted(not_modified), [1, 2, 3, 4])
+        self.assertTrue(all(values[0] is False for values in not_modified.values()))
+        self.assertTrue(any(True in values[1:] for values in not_modified.values()))
 
 
 if __name__ == '__main__':
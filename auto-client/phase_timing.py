@@ -0,0 +1,122 @@
+import time
+from contextvars import ContextVar
+from types import SimpleNamespace
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection
+
+# Durations in ns that are added to the next logged record, they add up to the time from the request start to its decoded body:
+# connect: TCP connection setup, 0 on a reused connection
+# ttfb: request sent until the response headers arrived, without the connection setup
+# transfer: response headers until the whole body arrived
+# decode: JSON decoding of the body
+# think: end of the previous request of the same client until the start of this one
+timing_enabled = False
+# Each (virtual) client times its own requests, asyncio tasks of virtual clients see their own values
+current_request: ContextVar[dict | None] = ContextVar('current_request', default=None)
+last_request_end: ContextVar[int | None] = ContextVar('last_request_end', default=None)
+
+
+def enable_phase_timing():
+    global timing_enabled
+    timing_enabled = True
+
+
+def phase_timing_enabled() -> bool:
+    return timing_enabled
+
+
+def begin_request() -> bool:
+    if not timing_enabled:
+        return False
+    now = time.perf_counter_ns()
+    last_end = last_request_end.get()
+    current_request.set({'start': now, 'connect': 0, 'think': None if last_end is None else now - last_end})
+    return True
+
+
+def record_connect(duration: int):
+    request = current_request.get()
+    if request is not None:
+        request['connect'] += duration
+
+
+def record_mark(mark: str):
+    request = current_request.get()
+    if request is not None:
+        request[mark] = time.perf_counter_ns()
+
+
+def record_decoded():
+    request = current_request.get()
+    if request is not None:
+        request['decoded'] = time.perf_counter_ns()
+        last_request_end.set(request['decoded'])
+
+
+def take_phases() -> dict | None:
+    """Returns the phases of the current request once, only the first record that is logged for a request gets them."""
+    request = current_request.get()
+    if request is None:
+        return None
+    current_request.set(None)
+    phases = {'connect': request['connect']}
+    if 'headers' in request:
+        phases['ttfb'] = request['headers'] - request['start'] - request['connect']
+        if 'body' in request:
+            phases['transfer'] = request['body'] - request['headers']
+            if 'decoded' in request:
+                phases['decode'] = request['decoded'] - request['body']
+    if request['think'] is not None:
+        phases['think'] = request['think']
+    return phases
+
+
+class PhaseTimingConnection(HTTPConnection):
+
+    def connect(self):
+        start = time.perf_counter_ns()
+        super().connect()
+        record_connect(time.perf_counter_ns() - start)
+
+
+class PhaseTimingConnectionPool(HTTPConnectionPool):
+    ConnectionCls = PhaseTimingConnection
+
+
+class PhaseTimingAdapter(HTTPAdapter):
+    """Marks the arrival of the headers, requests reads the body only after the adapter returned the response."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': PhaseTimingConnectionPool, 'https': HTTPSConnectionPool}
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        record_mark('headers')
+        return response
+
+
+def timed_request(method: str, url: str, **kwargs) -> requests.Response:
+    # Like requests.request, with a connection pool that times the connection setup
+    with requests.Session() as session:
+        session.mount('http://', PhaseTimingAdapter())
+        response = session.request(method, url, **kwargs)
+    record_mark('body')
+    return response
+
+
+def phase_trace_config() -> aiohttp.TraceConfig:
+    async def on_connection_create_start(session, context: SimpleNamespace, params):
+        context.connect_start = time.perf_counter_ns()
+
+    async def on_connection_create_end(session, context: SimpleNamespace, params):
+        record_connect(time.perf_counter_ns() - context.connect_start)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
@@ -0,0 +1,96 @@
+import json
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from client_log import log_event, log_version
+
+TRACE_MAGIC = b'ACTR\x01'
+METHODS = ['GET', 'POST']
+METHOD_IDS = {method: i for i, method in enumerate(METHODS)}
+# offset since the start of the recording in ns, method, path length, body length
+TRACE_RECORD = struct.Struct('<qBHI')
+
+
+@dataclass
+class TraceEntry:
+    offset: int
+    method: str
+    path: str
+    body: dict | None
+
+
+class TraceRecorder:
+    """Appends every request of the client to a trace, paths are relative to the mode prefix of the edge server."""
+    stream: BinaryIO
+    start_time: int | None
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.start_time = None
+        self.stream.write(TRACE_MAGIC)
+
+    def record(self, method: str, path: str, body: dict = None):
+        now = time.time_ns()
+        if self.start_time is None:
+            self.start_time = now
+        encoded_path = path.encode()
+        encoded_body = b'' if body is None else json.dumps(body).encode()
+        self.stream.write(TRACE_RECORD.pack(now - self.start_time, METHOD_IDS[method], len(encoded_path), len(encoded_body)) + encoded_path + encoded_body)
+
+    def close(self):
+        self.stream.close()
+
+
+trace_recorder: TraceRecorder = None
+
+
+def set_trace_recorder(recorder: TraceRecorder):
+    global trace_recorder
+    trace_recorder = recorder
+
+
+def close_trace_recorder():
+    if trace_recorder is not None:
+        trace_recorder.close()
+
+
+def record_request(method: str, path: str, body: dict = None):
+    if trace_recorder is not None:
+        trace_recorder.record(method, path, body)
+
+
+def read_trace(path: Path) -> Iterator[TraceEntry]:
+    with open(path, 'rb') as trace_file:
+        # An empty file cannot be mapped, e.g. the trace of a client that was stopped before it wrote anything
+        if os.fstat(trace_file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(trace_file.fileno(), 0, access=mmap.ACCESS_READ) as trace:
+            if trace[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+                raise ValueError(f'{path} is not an auto-client request trace')
+            position = len(TRACE_MAGIC)
+            while position + TRACE_RECORD.size <= len(trace):
+                offset, method, path_length, body_length = TRACE_RECORD.unpack_from(trace, position)
+                position += TRACE_RECORD.size
+                request_path = trace[position:position + path_length].decode()
+                position += path_length
+                body = json.loads(trace[position:position + body_length]) if body_length > 0 else None
+                position += body_length
+                yield TraceEntry(offset, METHODS[method], request_path, body)
+
+
+def log_replayed_response(entry: TraceEntry, response, status: int, body: dict, start_time: int, client_number: int = None):
+    # A 304 of a revalidating client carries the body it already had
+    if 200 <= status < 300 or status == 304:
+        if entry.method == 'GET' and 'meta' in body:
+            log_version(body['meta'], response, start_time, client_number=client_number)
+        else:
+            log_event('Success', f'{entry.method} {entry.path}', start_time, start_time, client_number=client_number)
+    elif status == 404:
+        log_event('Inconsistent', f'{entry.method} {entry.path} not found', start_time, start_time, object=entry.path, client_number=client_number)
+    else:
+        log_event('Conflict', f'{entry.method} {entry.path} returned {status}: {body}', start_time, start_time, client_number=client_number)
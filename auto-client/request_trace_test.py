@@ -0,0 +1,32 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from request_trace import TraceRecorder, read_trace
+
+
+class TestRequestTrace(unittest.TestCase):
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_path = Path(tmp_dir) / 'client.trace'
+            recorder = TraceRecorder(trace_path.open('wb'))
+            recorder.record('GET', '/forums')
+            recorder.record('POST', '/forums/12', {'message': 'abc'})
+            recorder.close()
+
+            entries = list(read_trace(trace_path))
+            self.assertEqual([(entry.method, entry.path, entry.body) for entry in entries],
+                             [('GET', '/forums', None), ('POST', '/forums/12', {'message': 'abc'})])
+            self.assertEqual(entries[0].offset, 0)
+            self.assertGreaterEqual(entries[1].offset, 0)
+
+    def test_empty_trace(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_path = Path(tmp_dir) / 'client.trace'
+            trace_path.touch()
+            self.assertEqual(list(read_trace(trace_path)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from decoding import loads
+from phase_timing import record_decoded
+
+
+class ValidatorCache:
+    """Remembers the ETag and the decoded body of every path, a 304 answer reuses the body the client already has."""
+    entries: dict[str, tuple[str, Any]]
+
+    def __init__(self):
+        self.entries = {}
+
+    def request_headers(self, path: str, headers: dict | None) -> dict | None:
+        entry = self.entries.get(path)
+        if entry is None:
+            return headers
+        return {**(headers or {}), 'If-None-Match': entry[0]}
+
+    def not_modified_body(self, path: str) -> Any:
+        return self.entries[path][1]
+
+    def store(self, path: str, etag: str | None, body: Any):
+        if etag is not None:
+            self.entries[path] = (etag, body)
+
+
+# Each (virtual) client has its own cache, asyncio tasks of virtual clients set their own value
+validator_cache: ContextVar[ValidatorCache | None] = ContextVar('validator_cache', default=None)
+
+
+def enable_revalidation():
+    validator_cache.set(ValidatorCache())
+
+
+def fork_validator_cache():
+    """Gives the current task its own cache, asyncio tasks run in a copy of the context of their creator."""
+    if validator_cache.get() is not None:
+        validator_cache.set(ValidatorCache())
+
+
+def revalidation_headers(method: str, path: str, headers: dict | None) -> dict | None:
+    cache = validator_cache.get()
+    if cache is None or method != 'GET':
+        return headers
+    return cache.request_headers(path, headers)
+
+
+def decode_response(path: str, response, extract: Callable[[Any], Any] = None) -> Any:
+    """Decodes a response of the requests library, a 304 answers with the body stored for its ETag.
+
+    Successful responses are reduced by `extract`, only its result is kept and stored for revalidation.
+    """
+    cache = validator_cache.get()
+    if cache is not None and response.status_code == 304:
+        body = cache.not_modified_body(path)
+    else:
+        body = loads(response.content)
+        if extract is not None and response.ok:
+            body = extract(body)
+        if cache is not None:
+            cache.store(path, response.headers.get('ETag'), body)
+    record_decoded()
+    return body
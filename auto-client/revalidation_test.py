@@ -0,0 +1,38 @@
+import contextvars
+import unittest
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from revalidation import decode_response, enable_revalidation, revalidation_headers
+
+
+def make_response(status_code: int, body: bytes, etag: str = None) -> Response:
+    response = Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers = CaseInsensitiveDict({'ETag': etag} if etag else {})
+    return response
+
+
+class TestRevalidation(unittest.TestCase):
+
+    def test_not_modified_reuses_body(self):
+        def run():
+            enable_revalidation()
+            self.assertEqual(revalidation_headers('GET', '/forums', None), None)
+            self.assertEqual(decode_response('/forums', make_response(200, b'[{"id": 1}]', '"abc"')), [{'id': 1}])
+
+            self.assertEqual(revalidation_headers('GET', '/forums', {'no-invalidation': 'True'}), {'no-invalidation': 'True', 'If-None-Match': '"abc"'})
+            self.assertEqual(revalidation_headers('POST', '/forums', None), None)
+            self.assertEqual(decode_response('/forums', make_response(304, b'')), [{'id': 1}])
+
+        contextvars.copy_context().run(run)
+
+    def test_disabled(self):
+        self.assertEqual(revalidation_headers('GET', '/forums', None), None)
+        self.assertEqual(decode_response('/forums', make_response(200, b'[]', '"abc"')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
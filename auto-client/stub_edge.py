@@ -0,0 +1,145 @@
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NUM_FLIGHTS = 100
+NUM_SEATS = 100
+NUM_FORUMS = 100
+PATH = re.compile(r'^/(proxy|cache|crdt)(/flights|/forums)(?:/(\d+))?(/book/(\d+))?$')
+
+
+def dumps(document) -> bytes:
+    # Serialized like JSON.stringify of the TypeScript servers
+    return json.dumps(document, separators=(',', ':')).encode()
+
+
+class StubState:
+    """The flights and forums of the origin, with versions that advance on every successful booking or post."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights_version = 0
+        self.flights = {f'{i}': {'number': f'{i}'} for i in range(NUM_FLIGHTS)}
+        self.flight_details = {f'{i}': {'data': {'number': f'{i}', 'seatingPlan': {f'{j}': {'number': j, 'booked': False} for j in range(NUM_SEATS)},
+                                                 'seatsLeft': NUM_SEATS},
+                                        'meta': {'id': f'flight_{i}', 'version': 0}} for i in range(NUM_FLIGHTS)}
+        self.forums_version = 0
+        self.forums = [{'id': i, 'title': f'Forum {i}'} for i in range(NUM_FORUMS)]
+        self.forum_details = {f'{i}': {'data': [], 'meta': {'id': f'forum_{i}', 'version': 0}} for i in range(NUM_FORUMS)}
+        # Serialized bodies per path, dropped whenever the object changes
+        self.bodies: dict[str, tuple[bytes, str]] = {}
+        # Paths an edge served before, later requests of the cache modes are hits
+        self.cached: set[str] = set()
+
+    def body(self, path: str, document: dict) -> tuple[bytes, str]:
+        if path not in self.bodies:
+            body = dumps(document)
+            self.bodies[path] = body, f'"{hashlib.sha1(body).hexdigest()}"'
+        return self.bodies[path]
+
+    def get(self, collection: str, item: str | None) -> tuple[int, bytes, str]:
+        with self.lock:
+            if collection == '/flights' and item is None:
+                return (200,) + self.body('/flights', {'data': self.flights, 'meta': {'id': 'flights', 'version': self.flights_version}})
+            if collection == '/forums' and item is None:
+                return (200,) + self.body('/forums', {'data': self.forums, 'meta': {'id': 'forums', 'version': self.forums_version}})
+            details = self.flight_details if collection == '/flights' else self.forum_details
+            if item not in details:
+                return 404, dumps({'errors': ['Not found']}), None
+            return (200,) + self.body(f'{collection}/{item}', details[item])
+
+    def book(self, flight: str, seat: str) -> tuple[int, bytes]:
+        with self.lock:
+            details = self.flight_details.get(flight)
+            if details is None or seat not in details['data']['seatingPlan']:
+                return 404, dumps({'errors': ['Not found']})
+            if details['data']['seatingPlan'][seat]['booked']:
+                return 409, dumps({'success': False})
+            details['data']['seatingPlan'][seat]['booked'] = True
+            details['data']['seatsLeft'] -= 1
+            details['meta']['version'] += 1
+            self.bodies.pop(f'/flights/{flight}', None)
+            return 200, dumps({'success': True})
+
+    def post(self, forum: str, message: str) -> tuple[int, bytes]:
+        with self.lock:
+            details = self.forum_details.get(forum)
+            if details is None:
+                return 404, dumps({'errors': ['Not found']})
+            details['data'].insert(0, {'message': message})
+            details['meta']['version'] += 1
+            self.bodies.pop(f'/forums/{forum}', None)
+            return 200, dumps({'success': True, 'message': message})
+
+
+class StubEdgeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, Nagle would hold the body back for a delayed ACK
+    disable_nagle_algorithm = True
+    server: 'StubEdgeServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, headers: dict):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', f'{len(body)}')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        match = PATH.match(self.path)
+        if match is None or match.group(4):
+            return self.send_body(404, dumps({'errors': ['Not found']}), {})
+        mode, collection, item = match.group(1), match.group(2), match.group(3)
+        status, body, etag = self.server.state.get(collection, item)
+        headers = {}
+        if mode != 'proxy' and status == 200:
+            # Like the edge servers, the first request of an object fills the cache
+            key = f'{mode}{collection}/{item}'
+            headers['X-Cached'] = 'true' if key in self.server.state.cached else 'false'
+            self.server.state.cached.add(key)
+            if mode == 'cache' and (self.headers.get('If-None-Match') or self.headers.get('revalidate')):
+                headers['ETag'] = etag
+                if self.headers.get('If-None-Match') == etag:
+                    return self.send_body(304, b'', headers)
+        self.send_body(status, body, headers)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        match = PATH.match(self.path)
+        if match is None or match.group(3) is None:
+            return self.send_body(404, dumps({'errors': ['Not found']}), {})
+        if match.group(2) == '/flights':
+            status, response = self.server.state.book(match.group(3), match.group(5))
+        else:
+            status, response = self.server.state.post(match.group(3), json.loads(body or b'{}').get('message', ''))
+        self.send_body(status, response, {})
+
+
+class StubEdgeServer(ThreadingHTTPServer):
+    """An edge server stand-in that runs in a thread of the benchmark, listening on a free loopback port."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubEdgeHandler)
+        self.state = StubState()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f'{host}:{port}'
+
+    def __enter__(self) -> 'StubEdgeServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
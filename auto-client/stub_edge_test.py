@@ -0,0 +1,39 @@
+import json
+import unittest
+import urllib.error
+import urllib.request
+
+from stub_edge import StubEdgeServer
+
+
+class TestStubEdge(unittest.TestCase):
+
+    def request(self, server: StubEdgeServer, method: str, path: str, headers: dict = None):
+        request = urllib.request.Request(f'http://{server.address}{path}', method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+    def test_versions_and_cache_headers(self):
+        with StubEdgeServer() as server:
+            status, headers, body = self.request(server, 'GET', '/crdt/flights/3')
+            self.assertEqual((status, headers['X-Cached']), (200, 'false'))
+            self.assertEqual(json.loads(body)['meta'], {'id': 'flight_3', 'version': 0})
+
+            self.assertEqual(self.request(server, 'POST', '/crdt/flights/3/book/7')[0], 200)
+            self.assertEqual(self.request(server, 'POST', '/crdt/flights/3/book/7')[0], 409)
+            status, headers, body = self.request(server, 'GET', '/crdt/flights/3')
+            self.assertEqual(headers['X-Cached'], 'true')
+            self.assertEqual(json.loads(body)['meta']['version'], 1)
+            self.assertTrue(json.loads(body)['data']['seatingPlan']['7']['booked'])
+
+            self.assertIsNone(self.request(server, 'GET', '/cache/forums')[1]['ETag'])
+            status, headers, _ = self.request(server, 'GET', '/cache/forums', {'revalidate': 'True'})
+            self.assertEqual(self.request(server, 'GET', '/cache/forums', {'If-None-Match': headers['ETag']})[0], 304)
+            self.assertIsNone(self.request(server, 'GET', '/proxy/forums')[1]['X-Cached'])
+
+
+if __name__ == '__main__':
+    unittest.main()
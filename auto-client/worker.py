@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Runs auto-clients on behalf of a remote coordinator (mininet/coordinator.py).
+
+The control protocol is one JSON object per line over TCP, the coordinator sends
+  {"type": "Ping"}                                              answered with {"type": "Pong", "time"}
+  {"type": "Launch", "start_time", "clients": [{"client", "args"}]} answered with {"type": "Launched", "client", "pid"} per client
+  {"type": "Stop"}                                              answered with {"type": "Stopped"} once all clients exited
+and the worker streams {"type": "FirstRequest", "client", "time"}, {"type": "Exited", "client", "code"} and every
+--report-interval the merged histograms of its clients {"type": "Summary", "time", "event", "cached", "clients", "count", "sum", "buckets"}.
+All times are in the clock of the worker, the coordinator translates them with the offset it measured.
+"""
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import click
+
+from histogram import LatencyHistogram
+from zygote import run_worker
+
+
+class HistogramFiles:
+    """Reads the histogram summaries the clients appended since the last call."""
+    offsets: dict[Path, int]
+
+    def __init__(self):
+        self.offsets = {}
+
+    def add(self, histogram_file: Path):
+        self.offsets[histogram_file] = 0
+
+    def read(self) -> list[dict]:
+        summaries = []
+        for histogram_file, offset in self.offsets.items():
+            if not histogram_file.exists():
+                continue
+            with histogram_file.open() as file:
+                file.seek(offset)
+                for line in iter(file.readline, ''):
+                    if not line.endswith('\n'):
+                        break
+                    offset = file.tell()
+                    summaries.append(json.loads(line))
+            self.offsets[histogram_file] = offset
+        return summaries
+
+
+class Worker:
+    clients: dict[int, int]
+
+    def __init__(self, connection: socket.socket, log_dir: Path, report_interval: float):
+        self.connection = connection
+        self.log_dir = log_dir
+        self.report_interval = report_interval
+        self.clients = {}
+        self.histograms = HistogramFiles()
+        self.stopping = False
+        self.selector = selectors.DefaultSelector()
+        self.buffer = b''
+
+    def send(self, message: dict):
+        self.connection.sendall((json.dumps(message) + '\n').encode())
+
+    def launch(self, start_time: int, clients: list[dict]):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        for client in clients:
+            number = client['client']
+            histogram_file = self.log_dir / f'client_{number}.hist'
+            self.histograms.add(histogram_file)
+            args = client['args'] + ['--client-number', f'{number}', '--histogram-file', f'{histogram_file}', '--start-at', f'{start_time}']
+            command = {'args': args, 'stdout': f'{self.log_dir / f"client_{number}.log"}', 'stderr': f'{self.log_dir / f"client_{number}.err.log"}'}
+
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                self.connection.close()
+                run_worker(command, os.fdopen(write_fd, 'w'))
+            os.close(write_fd)
+            self.clients[pid] = number
+            self.selector.register(os.fdopen(read_fd), selectors.EVENT_READ, number)
+            self.send({'type': 'Launched', 'client': number, 'pid': pid})
+
+    def stop(self):
+        self.stopping = True
+        for pid in self.clients:
+            os.kill(pid, signal.SIGINT)
+
+    def reap(self):
+        for pid, number in list(self.clients.items()):
+            waited_pid, status = os.waitpid(pid, os.WNOHANG)
+            if waited_pid == pid:
+                del self.clients[pid]
+                self.send({'type': 'Exited', 'client': number, 'code': os.waitstatus_to_exitcode(status)})
+
+    def report(self):
+        # The summaries of all clients merged per event, one message per event and interval
+        merged: dict[tuple, LatencyHistogram] = defaultdict(LatencyHistogram)
+        for summary in self.histograms.read():
+            merged[(summary['event'], summary['cached'])].merge(LatencyHistogram.from_dict(summary))
+        now = time.time_ns()
+        for (event, cached), histogram in merged.items():
+            self.send({'type': 'Summary', 'time': now, 'event': event, 'cached': cached, 'clients': len(self.clients), **histogram.to_dict()})
+
+    def handle(self, message: dict):
+        if message['type'] == 'Ping':
+            self.send({'type': 'Pong', 'time': time.time_ns()})
+        elif message['type'] == 'Launch':
+            self.launch(message['start_time'], message['clients'])
+        elif message['type'] == 'Stop':
+            self.stop()
+
+    def receive(self) -> bool:
+        data = self.connection.recv(65536)
+        if not data:
+            return False
+        self.buffer += data
+        while b'\n' in self.buffer:
+            line, self.buffer = self.buffer.split(b'\n', 1)
+            if line.strip():
+                self.handle(json.loads(line))
+        return True
+
+    def run(self):
+        self.selector.register(self.connection, selectors.EVENT_READ, None)
+        next_report = time.monotonic() + self.report_interval
+        try:
+            while not (self.stopping and not self.clients):
+                for key, _ in self.selector.select(max(0.0, next_report - time.monotonic())):
+                    if key.data is None:
+                        if not self.receive():
+                            logging.warning('Coordinator disconnected, stopping the clients')
+                            self.selector.unregister(self.connection)
+                            self.stop()
+                    else:
+                        line = key.fileobj.readline()
+                        if not line:
+                            self.selector.unregister(key.fileobj)
+                            key.fileobj.close()
+                            continue
+                        report = json.loads(line)
+                        if report['type'] == 'FirstRequest':
+                            self.send({'type': 'FirstRequest', 'client': key.data, 'time': report['time']})
+                self.reap()
+                if time.monotonic() >= next_report:
+                    self.report()
+                    next_report += self.report_interval
+            self.report()
+            self.send({'type': 'Stopped'})
+        except OSError as e:
+            logging.warning(f'Control connection failed: {e}')
+            self.stop()
+            for pid in self.clients:
+                os.waitpid(pid, 0)
+        finally:
+            self.selector.close()
+
+
+@click.command()
+@click.option('--listen', type=str, default='0.0.0.0:7000', help='host:port the coordinator connects to')
+@click.option('--log-dir', type=click.Path(file_okay=False, dir_okay=True), default='fleet-logs', help='Client logs and histograms are kept locally in a directory per run')
+@click.option('--report-interval', type=click.FloatRange(min=0, min_open=True), default=1.0, help='Seconds between two summaries sent to the coordinator')
+def main(listen: str, log_dir: str, report_interval: float):
+    """Waits for a coordinator and runs the clients it assigns, one coordinator run after another."""
+    logging.basicConfig(level=logging.INFO)
+    # SIGINT is meant for the clients, the worker stops them and ends the run
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    host, _, port = listen.rpartition(':')
+    with socket.create_server((host, int(port)), reuse_port=hasattr(socket, 'SO_REUSEPORT')) as server:
+        logging.info(f'Worker listening on {listen}')
+        runs = 0
+        while True:
+            connection, address = server.accept()
+            with connection:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                logging.info(f'Coordinator {address[0]}:{address[1]} connected')
+                run_dir = Path(log_dir) / f'run_{time.strftime("%Y%m%d-%H%M%S")}_{runs}'
+                Worker(connection, run_dir, report_interval).run()
+                runs += 1
+
+
+if __name__ == '__main__':
+    main()
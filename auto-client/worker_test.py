@@ -0,0 +1,28 @@
+import json
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from worker import Worker
+
+
+class TestWorker(unittest.TestCase):
+
+    def test_ping_and_stop(self):
+        coordinator, connection = socket.socketpair()
+        with tempfile.TemporaryDirectory() as tmp_dir, coordinator, connection:
+            worker = threading.Thread(target=Worker(connection, Path(tmp_dir), 0.05).run)
+            worker.start()
+            replies = coordinator.makefile('r')
+            coordinator.sendall(b'{"type": "Ping"}\n')
+            self.assertEqual(json.loads(replies.readline())['type'], 'Pong')
+            coordinator.sendall(b'{"type": "Stop"}\n')
+            worker.join(timeout=5)
+            self.assertFalse(worker.is_alive())
+            self.assertEqual(json.loads(replies.readline())['type'], 'Stopped')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import string
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+
+# Both the flights and the forums listing of the origin contain 100 entries
+NUM_ITEMS = 100
+POST_LENGTH = 25
+DEFAULT_POPULARITY = {'flights': 'normal:mu=20,sigma=30', 'forums': 'uniform'}
+# Batches of rejected normal draws before the rest is clipped into the items, a distribution far off the items would never finish
+MAX_REJECTION_ROUNDS = 100
+# Seeds the arrival times apart from the choices of the client
+ARRIVAL_STREAM = 1
+
+Sampler = Callable[[int], np.ndarray]
+
+
+def uniform_sampler(rng: np.random.Generator, num_items: int) -> Sampler:
+    return lambda size: rng.integers(0, num_items, size)
+
+
+def normal_sampler(rng: np.random.Generator, num_items: int, mu: float = 20, sigma: float = 30) -> Sampler:
+    def sample(size: int) -> np.ndarray:
+        # Rejection sampling over whole batches, draws are truncated towards zero like int()
+        result = np.empty(0, dtype=np.int64)
+        for _ in range(MAX_REJECTION_ROUNDS):
+            if len(result) >= size:
+                return result[:size]
+            draws = np.trunc(rng.normal(mu, sigma, size)).astype(np.int64)
+            result = np.concatenate([result, draws[(draws >= 0) & (draws < num_items)]])
+        clipped = np.clip(np.trunc(rng.normal(mu, sigma, size - len(result))), 0, num_items - 1).astype(np.int64)
+        return np.concatenate([result, clipped])
+    return sample
+
+
+def zipf_sampler(rng: np.random.Generator, num_items: int, s: float = 1.0) -> Sampler:
+    weights = 1 / np.arange(1, num_items + 1) ** s
+    cdf = np.cumsum(weights) / np.sum(weights)
+    return lambda size: np.minimum(np.searchsorted(cdf, rng.random(size), side='right'), num_items - 1)
+
+
+def hotspot_sampler(rng: np.random.Generator, num_items: int, fraction: float = 0.1, probability: float = 0.9, shift: int = 10000) -> Sampler:
+    # `probability` of the requests go to a hot set of `fraction` of the items, which moves on every `shift` choices
+    if int(shift) < 1:
+        raise ValueError(f'hotspot shift must be at least 1, got {shift}')
+    if not 0 <= probability <= 1:
+        raise ValueError(f'hotspot probability must be between 0 and 1, got {probability}')
+    hot_items = min(max(1, int(num_items * fraction)), num_items - 1)
+    drawn = 0
+
+    def sample(size: int) -> np.ndarray:
+        nonlocal drawn
+        period = (drawn + np.arange(size)) // int(shift)
+        hot = rng.random(size) < probability
+        choice = np.where(hot, rng.integers(0, hot_items, size), rng.integers(hot_items, num_items, size))
+        drawn += size
+        return (choice + period * hot_items) % num_items
+    return sample
+
+
+DISTRIBUTIONS = {
+    'uniform': uniform_sampler,
+    'normal': normal_sampler,
+    'zipf': zipf_sampler,
+    'hotspot': hotspot_sampler,
+}
+
+
+def parse_distribution(spec: str) -> tuple[str, dict[str, float]]:
+    """Parses a popularity spec like `zipf:s=1.2` or `hotspot:fraction=0.1,probability=0.9,shift=5000`."""
+    name, _, params = spec.partition(':')
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f'Unknown distribution {name}, choose from {", ".join(DISTRIBUTIONS)}')
+    parameters = {}
+    for param in filter(None, params.split(',')):
+        key, _, value = param.partition('=')
+        parameters[key.strip()] = float(value)
+    return name, parameters
+
+
+def make_sampler(popularity: str, rng: np.random.Generator, num_items: int = NUM_ITEMS) -> Sampler:
+    """Builds the sampler of a popularity spec, unknown or invalid parameters raise a ValueError."""
+    name, parameters = parse_distribution(popularity)
+    try:
+        return DISTRIBUTIONS[name](rng, num_items, **parameters)
+    except TypeError:
+        raise ValueError(f'Unknown parameters {", ".join(parameters)} for distribution {name}')
+
+
+def load_workload_file(path: Path) -> dict:
+    with open(path) as workload_file:
+        return json.load(workload_file)
+
+
+class SampleBuffer:
+    """Hands out values from a pre-sampled batch and only calls into NumPy when it runs empty."""
+    values: list
+    position: int
+
+    def __init__(self, sample: Callable[[int], np.ndarray], batch_size: int):
+        self.sample = sample
+        self.batch_size = batch_size
+        self.values = []
+        self.position = 0
+
+    def next(self):
+        if self.position >= len(self.values):
+            self.values = self.sample(self.batch_size).tolist()
+            self.position = 0
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+
+class ClientWorkload:
+    """The random choices of a single (virtual) client, each client owns its buffers."""
+
+    def __init__(self, popularity: str, seed: int = 42, client_number: int = 0, batch_size: int = 4096):
+        self.rng = np.random.default_rng([seed, client_number])
+        self.items = SampleBuffer(make_sampler(popularity, self.rng), batch_size)
+        self.seats = SampleBuffer(self.rng.random, batch_size)
+        self.posts = SampleBuffer(self.sample_posts, max(1, batch_size // 64))
+
+    def sample_posts(self, size: int) -> np.ndarray:
+        letters = np.frombuffer(string.ascii_lowercase.encode(), dtype=np.uint8)
+        characters = letters[self.rng.integers(0, len(letters), (size, POST_LENGTH))]
+        return characters.view(f'S{POST_LENGTH}')[:, 0].astype(f'U{POST_LENGTH}')
+
+    def item_choice(self) -> int:
+        return self.items.next()
+
+    def seat_choice(self, available_seats: list):
+        return available_seats[int(self.seats.next() * len(available_seats))]
+
+    def post_message(self) -> str:
+        return self.posts.next()
+
+
+def arrival_rng(seed: int, client_number: int) -> np.random.Generator:
+    return np.random.default_rng([seed, client_number, ARRIVAL_STREAM])
+
+
+def arrival_timeline(rate: float, arrival: str, rng: np.random.Generator, batch_size: int = 10000) -> Iterator[int]:
+    """Yields session start offsets in ns for an open-loop run at `rate` sessions per second."""
+    offset = 0.0
+    while True:
+        if arrival == 'poisson':
+            gaps = rng.exponential(1 / rate, batch_size)
+        else:
+            gaps = np.full(batch_size, 1 / rate)
+        offsets = offset + np.cumsum(gaps)
+        offset = offsets[-1]
+        yield from (offsets * 10**9).astype(np.int64).tolist()
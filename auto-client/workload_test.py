@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from workload import ClientWorkload, NUM_ITEMS, arrival_rng, arrival_timeline, make_sampler, parse_distribution
+
+
+class TestClientWorkload(unittest.TestCase):
+
+    def test_choices_stay_in_range(self):
+        for popularity in ['uniform', 'normal:mu=20,sigma=30', 'zipf:s=1.2', 'hotspot:fraction=0.1,probability=0.9,shift=100']:
+            workload = ClientWorkload(popularity, batch_size=512)
+            choices = [workload.item_choice() for _ in range(2000)]
+            self.assertTrue(all(0 <= choice < NUM_ITEMS for choice in choices), popularity)
+
+    def test_zipf_skew(self):
+        workload = ClientWorkload('zipf:s=1.5')
+        choices = np.array([workload.item_choice() for _ in range(10000)])
+        self.assertGreater(np.mean(choices == 0), np.mean(choices == 1))
+        self.assertGreater(np.mean(choices < 10), 0.8)
+
+    def test_hotspot_shifts(self):
+        workload = ClientWorkload('hotspot:fraction=0.1,probability=1,shift=1000')
+        first = {workload.item_choice() for _ in range(1000)}
+        second = {workload.item_choice() for _ in range(1000)}
+        self.assertEqual(first, set(range(0, 10)))
+        self.assertEqual(second, set(range(10, 20)))
+
+    def test_seed_is_reproducible(self):
+        first, second = ClientWorkload('uniform', seed=1, client_number=3), ClientWorkload('uniform', seed=1, client_number=3)
+        self.assertEqual([first.item_choice() for _ in range(10)], [second.item_choice() for _ in range(10)])
+        self.assertEqual(first.post_message(), second.post_message())
+        self.assertEqual(len(first.post_message()), 25)
+
+    def test_parse_distribution(self):
+        self.assertEqual(parse_distribution('zipf:s=1.2'), ('zipf', {'s': 1.2}))
+        with self.assertRaises(ValueError):
+            parse_distribution('pareto')
+
+    def test_invalid_parameters(self):
+        for popularity in ['zipf:q=1', 'hotspot:shift=0', 'hotspot:probability=2']:
+            with self.assertRaises(ValueError, msg=popularity):
+                make_sampler(popularity, np.random.default_rng())
+
+    def test_normal_without_mass_in_items(self):
+        choices = make_sampler('normal:mu=1000,sigma=1', np.random.default_rng(), NUM_ITEMS)(100)
+        self.assertEqual(choices.tolist(), [NUM_ITEMS - 1] * 100)
+
+    def test_arrivals_are_reproducible(self):
+        first, second = arrival_timeline(5, 'poisson', arrival_rng(1, 3), 10), arrival_timeline(5, 'poisson', arrival_rng(1, 3), 10)
+        self.assertEqual([next(first) for _ in range(20)], [next(second) for _ in range(20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
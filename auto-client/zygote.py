@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Imports the client once and forks a ready-to-run client for every launch command read from stdin.
+
+A launch command is one JSON line {"args": [...], "stdout": path, "stderr": path, "append": bool}. The zygote answers
+on its stdout with {"type": "Launched", "pid", "time"} and later {"type": "FirstRequest", "pid", "time"} once the
+client sent its first request. SIGINT is forwarded to all clients, the zygote exits after its clients. Clients that
+exit earlier, e.g. after their own SIGINT, are reaped right away, so one zygote can serve many clients over time.
+"""
+import json
+import os
+import signal
+import sys
+import time
+from typing import TextIO
+
+import client_log
+import main as client_main
+
+
+def report(control: TextIO, message_type: str, pid: int, timestamp: int):
+    control.write(json.dumps({'type': message_type, 'pid': pid, 'time': timestamp}) + '\n')
+    control.flush()
+
+
+def run_worker(command: dict, control: TextIO):
+    code = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        sys.stdin = open(os.devnull)
+        os.dup2(sys.stdin.fileno(), 0)
+        flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if command.get('append') else os.O_TRUNC)
+        for fd, path in [(1, command['stdout']), (2, command['stderr'])]:
+            log_fd = os.open(path, flags, 0o644)
+            os.dup2(log_fd, fd)
+            os.close(log_fd)
+        client_log.set_first_request_callback(lambda timestamp: report(control, 'FirstRequest', os.getpid(), timestamp))
+        client_main.main(command['args'], prog_name='main.py')
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def reap_workers(workers: set[int], exit_codes: list[int]):
+    for pid in list(workers):
+        waited_pid, status = os.waitpid(pid, os.WNOHANG)
+        if waited_pid == pid:
+            workers.discard(pid)
+            exit_codes.append(os.waitstatus_to_exitcode(status))
+
+
+def wait_workers(workers: set[int], exit_codes: list[int]) -> int:
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    exit_code = max(exit_codes, default=0)
+    for pid in workers:
+        _, status = os.waitpid(pid, 0)
+        exit_code = max(exit_code, os.waitstatus_to_exitcode(status))
+    return exit_code
+
+
+def main():
+    # Stray output must not end up in the control channel
+    control = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+    workers = set()
+    exit_codes = []
+    signal.signal(signal.SIGCHLD, lambda signum, frame: reap_workers(workers, exit_codes))
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            command = json.loads(line)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                run_worker(command, control)
+            workers.add(pid)
+            report(control, 'Launched', pid, time.time_ns())
+    except KeyboardInterrupt:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for pid in workers:
+            os.kill(pid, signal.SIGINT)
+    sys.exit(wait_workers(workers, exit_codes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmarks of the client loop, the event logging path and the analysis ingestion, with regression checks against a baseline."""
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+
+REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+AUTO_CLIENT_DIR = REPOSITORY_DIR / 'auto-client'
+RESULTS_DIR = REPOSITORY_DIR / 'benchmarks' / 'results'
+# Implemented in cases.py, which imports the client and can only be loaded with auto-client on the path
+BENCHMARKS = ['client_sync_flights', 'client_sync_forums', 'client_sync_flights_revalidate', 'client_async_flights', 'client_async_forums',
+              'event_log_json', 'event_log_binary', 'ingest_client_logs']
+HIGHER_IS_BETTER = {'sessions_per_s', 'requests_per_s', 'records_per_s', 'rows_per_s'}
+LOWER_IS_BETTER = {'p50_ms', 'p99_ms'}
+# Checked absolutely, a failing client can look faster than a working one
+MUST_BE_ZERO = {'failures'}
+
+
+def run_case(name: str, sessions: int) -> dict:
+    """Runs one benchmark in a new interpreter, the validator cache, phase timing and edge router of the client start empty."""
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(AUTO_CLIENT_DIR), env.get('PYTHONPATH')]))
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.cases', name, '--sessions', f'{sessions}'], cwd=REPOSITORY_DIR, env=env,
+                            stdout=subprocess.PIPE, text=True, check=True)
+    # The client may log to stdout before the metrics
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_benchmark(name: str, sessions: int, repeat: int) -> dict:
+    # The median of every metric over the repetitions, failures of any repetition count
+    runs = [run_case(name, sessions) for _ in range(repeat)]
+    return {metric: (max if metric in MUST_BE_ZERO else statistics.median)(run[metric] for run in runs) for metric in runs[0]}
+
+
+def find_regressions(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Metrics of benchmarks in both results that got worse by more than `threshold` (relative to the baseline)."""
+    regressions = []
+    for name, metrics in current['benchmarks'].items():
+        for metric, value in metrics.items():
+            old_value = baseline['benchmarks'].get(name, {}).get(metric)
+            if old_value is None or old_value == 0:
+                continue
+            change = (value - old_value) / old_value
+            if (metric in HIGHER_IS_BETTER and change < -threshold) or (metric in LOWER_IS_BETTER and change > threshold):
+                regressions.append(f'{name}.{metric}: {old_value:.4g} -> {value:.4g} ({change:+.1%})')
+    return regressions
+
+
+def find_errors(current: dict) -> list[str]:
+    """Metrics that must be zero in every result, independent of the baseline."""
+    return [f'{name}.{metric}: {value}' for name, metrics in current['benchmarks'].items() for metric, value in metrics.items()
+            if metric in MUST_BE_ZERO and value > 0]
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+@click.command()
+@click.option('--only', multiple=True, help='Run only these benchmarks, all by default')
+@click.option('--sessions', type=click.IntRange(min=10), default=200, help='Client sessions per run, the other benchmarks scale with it')
+@click.option('--repeat', type=click.IntRange(min=1), default=3)
+@click.option('--out', type=click.Path(dir_okay=False), required=False, help='Result file, defaults to benchmarks/results/<commit>.json')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), required=False, help='Earlier result file to compare with')
+@click.option('--threshold', type=click.FloatRange(min=0), default=0.2, help='Relative slowdown of a metric that counts as a regression')
+def main(only: list[str], sessions: int, repeat: int, out: str, baseline: str, threshold: float):
+    """Runs the benchmarks, saves their results as JSON and exits with 1 if a client failed or a metric regressed against --baseline."""
+    logging.basicConfig(level=logging.WARNING)
+    unknown = set(only) - set(BENCHMARKS)
+    if unknown:
+        raise click.BadParameter(f'Unknown benchmarks {", ".join(sorted(unknown))}, choose from {", ".join(BENCHMARKS)}', param_hint='--only')
+
+    commit = current_commit()
+    results = {'commit': commit, 'time': time.time_ns(), 'python': platform.python_version(), 'sessions': sessions, 'benchmarks': {}}
+    for name in BENCHMARKS:
+        if only and name not in only:
+            continue
+        results['benchmarks'][name] = run_benchmark(name, sessions, repeat)
+        print(f'{name}: {json.dumps(results["benchmarks"][name])}', file=sys.stderr)
+
+    out_path = Path(out) if out else RESULTS_DIR / f'{commit}.json'
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(results, indent=1))
+    print(f'Results written to {out_path}', file=sys.stderr)
+
+    errors = find_errors(results)
+    for error in errors:
+        print(f'Error {error}', file=sys.stderr)
+    regressions = []
+    if baseline:
+        regressions = find_regressions(json.loads(Path(baseline).read_text()), results, threshold)
+        for regression in regressions:
+            print(f'Regression {regression}', file=sys.stderr)
+    if errors or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import unittest
+
+from benchmarks.bench import find_errors, find_regressions
+
+
+class TestRegressions(unittest.TestCase):
+
+    def test_find_regressions(self):
+        baseline = {'benchmarks': {'client': {'sessions_per_s': 100.0, 'p99_ms': 10.0, 'failures': 0}, 'ingest': {'rows_per_s': 1000.0}}}
+        current = {'benchmarks': {'client': {'sessions_per_s': 85.0, 'p99_ms': 13.0, 'failures': 3}, 'event_log': {'records_per_s': 1.0}}}
+        self.assertEqual(find_regressions(baseline, current, 0.2), ['client.p99_ms: 10 -> 13 (+30.0%)'])
+        self.assertEqual(len(find_regressions(baseline, current, 0.1)), 2)
+
+    def test_failures_are_errors(self):
+        current = {'benchmarks': {'client': {'sessions_per_s': 120.0, 'failures': 2}, 'event_log': {'records_per_s': 1.0}}}
+        self.assertEqual(find_errors(current), ['client.failures: 2'])
+        self.assertEqual(find_errors({'benchmarks': {'client': {'sessions_per_s': 120.0, 'failures': 0}}}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
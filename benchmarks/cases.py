@@ -0,0 +1,123 @@
+"""The benchmark cases, each run by bench.py in a fresh interpreter so no client state carries over between cases.
+
+Runs from the repository root with auto-client on the PYTHONPATH, e.g. `PYTHONPATH=auto-client python3 -m benchmarks.cases client_sync_flights`.
+"""
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import click
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+import client_log
+import main as client_main
+from analysis.ingest import ingest_experiment
+from event_log import BinarySink, JsonLinesSink
+from histogram import LatencyHistogram
+from stub_edge import StubEdgeServer
+
+
+class CollectingSink:
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record: dict):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+def bench_client(api: str, mode: str, engine: str, sessions: int, virtual_clients: int = 1) -> dict:
+    sink = CollectingSink()
+    client_log.set_event_sink(sink)
+    with StubEdgeServer() as server:
+        start = time.perf_counter()
+        client_main.run_autonomous_client(api, mode, server.address, sessions, 1, engine, virtual_clients)
+        elapsed = time.perf_counter() - start
+
+    latencies = LatencyHistogram()
+    for record in sink.records:
+        if record['type'] == 'Versioning':
+            latencies.record(record['duration'])
+    failures = sum(1 for record in sink.records if record['type'] == 'Failure')
+    return {
+        'sessions_per_s': sessions * virtual_clients / elapsed,
+        'requests_per_s': latencies.total / elapsed,
+        'p50_ms': latencies.percentile(0.5) / 10**6,
+        'p99_ms': latencies.percentile(0.99) / 10**6,
+        'failures': failures,
+    }
+
+
+def bench_event_log(log_format: str, records: int) -> dict:
+    with open(os.devnull, 'wb' if log_format == 'binary' else 'w') as devnull:
+        client_log.set_event_sink(BinarySink(devnull) if log_format == 'binary' else JsonLinesSink(devnull))
+        response = Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict({'X-Cached': 'true', 'Content-Length': '3984'})
+        meta = {'id': 'flight_52', 'version': 7}
+
+        start = time.perf_counter()
+        for i in range(records // 2):
+            start_time = time.time_ns()
+            client_log.log_version(meta, response, start_time, client_number=1)
+            client_log.log_event('Success', f'booked seat {i % 100} True', start_time, start_time, client_number=1)
+        client_log.close_event_sink()
+        elapsed = time.perf_counter() - start
+    return {'records_per_s': records / elapsed}
+
+
+def write_experiment(experiment_dir: Path, clients: int, records: int):
+    with (experiment_dir / 'mininet.log').open('w') as mininet_log:
+        for active_clients in range(clients + 1):
+            mininet_log.write('INFO:root:' + json.dumps({'type': 'Update', 'time': active_clients * 10**9, 'active_clients': active_clients}) + '\n')
+    with (experiment_dir / 'origin.log').open('w') as origin_log:
+        for version in range(records // 10):
+            origin_log.write(json.dumps({'type': 'Versioning', 'time': version * 10**6, 'object': f'flight_{version % 100}', 'version': version // 100}) + '\n')
+    for client in range(clients):
+        with (experiment_dir / f'client_{client}.log').open('w') as log_file:
+            sink = JsonLinesSink(log_file)
+            for i in range(records // 2):
+                sink.write({'type': 'Versioning', 'time': i * 10**6, 'object': f'flight_{i % 100}', 'version': i // 100, 'duration': 2500000, 'cached': True})
+                sink.write({'type': 'Success', 'event': f'booked seat {i % 100} True', 'time': i * 10**6 + 1, 'duration': 10, 'total_duration': 30})
+
+
+def bench_ingest(clients: int, records: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        experiment_dir = Path(tmp_dir)
+        write_experiment(experiment_dir, clients, records)
+        start = time.perf_counter()
+        ingest_experiment(experiment_dir, workers=1, force=True)
+        elapsed = time.perf_counter() - start
+    return {'rows_per_s': (clients * records + records // 10 + clients + 1) / elapsed}
+
+
+CASES: dict[str, Callable[[int], dict]] = {
+    'client_sync_flights': lambda sessions: bench_client('flights', 'crdt', 'sync', sessions),
+    'client_sync_forums': lambda sessions: bench_client('forums', 'crdt', 'sync', sessions),
+    'client_sync_flights_revalidate': lambda sessions: bench_client('flights', 'revalidate', 'sync', sessions),
+    'client_async_flights': lambda sessions: bench_client('flights', 'crdt', 'async', sessions // 10, 10),
+    'client_async_forums': lambda sessions: bench_client('forums', 'crdt', 'async', sessions // 10, 10),
+    'event_log_json': lambda sessions: bench_event_log('json', sessions * 500),
+    'event_log_binary': lambda sessions: bench_event_log('binary', sessions * 500),
+    'ingest_client_logs': lambda sessions: bench_ingest(4, sessions * 100),
+}
+
+
+@click.command()
+@click.argument('name', type=click.Choice(list(CASES)))
+@click.option('--sessions', type=click.IntRange(min=10), default=200)
+def main(name: str, sessions: int):
+    """Runs the benchmark NAME once and prints its metrics as JSON on the last line of stdout."""
+    metrics = CASES[name](sessions)
+    print(json.dumps(metrics))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,29 @@
 import {NextFunction, Request, RequestHandler, Response} from "express";
+import {createHash} from "crypto";
 import proxy from "express-http-proxy"
 import {ClientRequest, IncomingHttpHeaders, IncomingMessage, OutgoingHttpHeaders} from "http";
 import {createClient, RedisClientType, SetOptions} from 'redis';
 import {Multicast} from "../multicast/multicast.js";
 
 class RedisCacheValue{
-    constructor(public body: string, public headers: string[]) {}
+    constructor(public body: string, public headers: string[], public etag?: string) {}
+}
+
+function computeETag(body: Buffer): string {
+    return `"${createHash('sha1').update(body).digest('base64url')}"`
+}
+
+// Only conditional requests and clients in revalidate mode pay for the hash, the other modes get no ETag
+function wantsETag(req: Request): boolean {
+    return req.method == 'GET' && (!!req.headers['if-none-match'] || !!req.headers['revalidate'])
+}
+
+function matchesETag(req: Request, etag: string): boolean {
+    const ifNoneMatch = req.headers['if-none-match']
+    if (!ifNoneMatch || !etag) {
+        return false
+    }
+    return ifNoneMatch.split(',').some(candidate => candidate.trim().replace(/^W\//, '') == etag)
 }
 
 class HTTPCache {
@@ -62,6 +80,15 @@ class HTTPCache {
             }
             res.setHeader('X-Cached', "true")
             const r = Buffer.from(redisObject.body, 'base64')
+            if (wantsETag(req)) {
+                // Entries stored by requests without validation have no ETag yet
+                const etag = redisObject.etag ?? computeETag(r)
+                res.setHeader('ETag', etag)
+                if (matchesETag(req, etag)) {
+                    res.status(304).end()
+                    return
+                }
+            }
             res.send(r.toString('ascii'))
         }
 
@@ -76,12 +103,20 @@ class HTTPCache {
             expirySeconds = 300
         }
 
+        let notModified = false
         if (proxyRes.statusCode == 200) {
+            let etag: string | undefined = undefined
+            if (wantsETag(userReq)) {
+                etag = computeETag(proxyResData)
+                userRes.setHeader('ETag', etag)
+                notModified = matchesETag(userReq, etag)
+            }
+
             let cc = proxyRes.headers["x-cache-control"]
             if (cc && cc.includes('max-age')) {
                 let cacheKey = userReq.url
                 const options: SetOptions = { EX: expirySeconds }
-                let cacheValue = new RedisCacheValue(proxyResData.toString('base64'), proxyRes.rawHeaders)
+                let cacheValue = new RedisCacheValue(proxyResData.toString('base64'), proxyRes.rawHeaders, etag)
                 await this.redis.set(cacheKey, JSON.stringify(cacheValue), options)
                 let labels = proxyRes.headersDistinct["x-label"]
                 if (labels) {
@@ -92,6 +127,12 @@ class HTTPCache {
             }
         }
 
+        if (notModified) {
+            // The client already has this body, only the validator travels back
+            userRes.status(304)
+            proxyResData = Buffer.alloc(0)
+        }
+
         if (userReq.headers['no-invalidation']) {
             return proxyResData
         }
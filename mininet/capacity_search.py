@@ -0,0 +1,113 @@
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from histogram import LatencyHistogram
+
+SUCCESS_EVENTS = {'Versioning', 'Success'}
+ERROR_EVENTS = {'Failure', 'Conflict'}
+# The first histogram interval after a scaling step still contains the old load
+WARMUP = 10**9
+
+
+@dataclass
+class Measurement:
+    active_clients: int
+    requests: int
+    p99: float
+    error_rate: float
+    throughput: float
+    ok: bool
+
+
+class HistogramTail:
+    """Reads the histogram summaries the clients appended since the last call."""
+    offsets: dict[Path, int]
+
+    def __init__(self, log_dir: Path):
+        self.log_dir = log_dir
+        self.offsets = {}
+
+    def read(self) -> list[dict]:
+        summaries = []
+        for histogram_file in sorted(self.log_dir.glob('client_*.hist')):
+            offset = self.offsets.get(histogram_file, 0)
+            with histogram_file.open() as file:
+                file.seek(offset)
+                for line in iter(file.readline, ''):
+                    if not line.endswith('\n'):
+                        break
+                    offset = file.tell()
+                    summaries.append(json.loads(line))
+            self.offsets[histogram_file] = offset
+        return summaries
+
+
+def evaluate(summaries: list[dict], active_clients: int, window_start: int, window_end: int, p99_slo: float, error_slo: float) -> Measurement:
+    latencies = LatencyHistogram()
+    requests = errors = 0
+    for summary in summaries:
+        if summary['interval_start'] < window_start or summary['time'] > window_end:
+            continue
+        requests += summary['count']
+        if summary['event'] in SUCCESS_EVENTS:
+            latencies.merge(LatencyHistogram.from_dict(summary))
+        elif summary['event'] in ERROR_EVENTS:
+            errors += summary['count']
+    p99 = latencies.percentile(0.99) / 10**6
+    error_rate = errors / requests if requests > 0 else 1.0
+    throughput = requests / ((window_end - window_start) / 10**9)
+    ok = requests > 0 and not math.isnan(p99) and p99 <= p99_slo and error_rate <= error_slo
+    return Measurement(active_clients, requests, p99, error_rate, throughput, ok)
+
+
+def search_capacity(topo, net, api: str, mode: str, log_dir: Path, stats: bool, step: int, window: int, max_clients: int,
+                    p99_slo: float, error_slo: float, resolution: int) -> Measurement:
+    """Doubles the clients while the SLO holds, then bisects between the last good and the first violating load."""
+    tail = HistogramTail(log_dir)
+    summaries = []
+
+    def measure_at(target: int) -> Measurement:
+        scale_time = time.time_ns()
+        while len(topo.client_processes) < target:
+            topo.start_client(net, len(topo.client_processes), api, mode, log_dir, stats, histogram=True, scale_time=scale_time)
+            logging.info(json.dumps({'type': 'Update', 'time': time.time_ns(), 'active_clients': len(topo.client_processes)}))
+        while len(topo.client_processes) > target:
+            topo.stop_client()
+            logging.info(json.dumps({'type': 'Update', 'time': time.time_ns(), 'active_clients': len(topo.client_processes)}))
+
+        window_start = time.time_ns() + WARMUP
+        time.sleep(WARMUP / 10**9 + window)
+        summaries.extend(tail.read())
+        measurement = evaluate(summaries, target, window_start, time.time_ns(), p99_slo, error_slo)
+        summaries[:] = [summary for summary in summaries if summary['time'] > window_start]
+        logging.info(json.dumps({'type': 'Search', 'time': time.time_ns(), **measurement.__dict__}))
+        return measurement
+
+    best = Measurement(0, 0, math.nan, 0.0, 0.0, True)
+    violating = None
+    target = min(step, max_clients)
+    while violating is None:
+        measurement = measure_at(target)
+        if not measurement.ok:
+            violating = target
+        else:
+            best = measurement
+            if target == max_clients:
+                break
+            target = min(target * 2, max_clients)
+
+    if violating is not None:
+        while violating - best.active_clients > resolution:
+            measurement = measure_at((best.active_clients + violating) // 2)
+            if measurement.ok:
+                best = measurement
+            else:
+                violating = measurement.active_clients
+
+    logging.info(json.dumps({'type': 'Capacity', 'time': time.time_ns(), 'api': api, 'mode': mode, 'max_clients': best.active_clients,
+                             'throughput': best.throughput, 'p99': best.p99, 'error_rate': best.error_rate, 'limited_by': 'slo' if violating is not None else 'topology'}))
+    return best
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Drives auto-client workers (auto-client/worker.py) on several load machines as one client fleet.
+
+The coordinator measures the clock offset of every worker, assigns the clients with their edge server and workload
+round-robin to the workers, starts all of them at the same instant and logs the merged latency histograms of the fleet.
+"""
+import json
+import logging
+import socket
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Empty, Queue
+
+import click
+
+from histogram import LatencyHistogram
+
+CLOCK_SAMPLES = 8
+
+
+@dataclass
+class ClockSample:
+    offset: int
+    rtt: int
+
+
+def estimate_offset(samples: list[ClockSample]) -> ClockSample:
+    # The sample with the shortest round trip bounds the offset error best, by half its RTT
+    return min(samples, key=lambda sample: sample.rtt)
+
+
+class WorkerConnection:
+    """Control connection to one worker, its messages end up in the shared queue together with the worker address."""
+
+    def __init__(self, address: str, messages: Queue):
+        host, _, port = address.rpartition(':')
+        self.address = address
+        self.messages = messages
+        self.socket = socket.create_connection((host, int(port)), timeout=10)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.socket.makefile('r')
+        self.offset = 0
+        self.rtt = 0
+        self.stopped = False
+
+    def send(self, message: dict):
+        self.socket.sendall((json.dumps(message) + '\n').encode())
+
+    def receive(self) -> dict:
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError(f'Worker {self.address} closed the connection')
+        return json.loads(line)
+
+    def synchronize(self, samples: int = CLOCK_SAMPLES):
+        measured = []
+        for _ in range(samples):
+            sent = time.time_ns()
+            self.send({'type': 'Ping'})
+            pong = self.receive()
+            received = time.time_ns()
+            measured.append(ClockSample(pong['time'] - (sent + received) // 2, received - sent))
+        best = estimate_offset(measured)
+        self.offset, self.rtt = best.offset, best.rtt
+
+    def to_local(self, worker_time: int) -> int:
+        return worker_time - self.offset
+
+    def listen(self):
+        self.socket.settimeout(None)
+        try:
+            while True:
+                self.messages.put((self, self.receive()))
+        except (ConnectionError, OSError) as e:
+            self.messages.put((self, {'type': 'Disconnected', 'error': f'{e}'}))
+
+
+def assign_clients(num_clients: int, first_client: int, workers: list[str], edges: list[str]) -> dict[str, list[tuple[int, str]]]:
+    """Client numbers with their edge server per worker, neighbouring client numbers go to different workers and edges."""
+    assignment = {worker: [] for worker in workers}
+    for i in range(num_clients):
+        assignment[workers[i % len(workers)]].append((first_client + i, edges[i % len(edges)]))
+    return assignment
+
+
+def client_edges(edge: str, edges: list[str], edge_selection: bool) -> str:
+    # The client tries the edges it knows nothing about in the given order
+    if not edge_selection:
+        return edge
+    return ','.join([edge] + [other for other in edges if other != edge])
+
+
+@click.command()
+@click.option('--worker', 'workers', multiple=True, required=True, help='host:port of a worker, repeat for every load machine')
+@click.option('--edge', 'edges', multiple=True, required=True, help='host:port of an edge server, clients are spread over all of them')
+@click.option('--api', type=click.Choice(['flights', 'forums']), required=True)
+@click.option('--mode', type=click.Choice(['proxy', 'cache', 'ttl', 'crdt', 'revalidate']), required=True)
+@click.option('--clients', type=click.IntRange(min=1), required=True, help='Number of client processes in the whole fleet')
+@click.option('--first-client', type=click.IntRange(min=0), default=0)
+@click.option('--duration', type=click.FloatRange(min=0, min_open=True), required=True, help='Seconds the fleet runs after the common start')
+@click.option('--start-delay', type=click.FloatRange(min=0), default=2.0, help='Seconds between the launch and the common start, covers the launch of all clients')
+@click.option('--report-interval', type=click.FloatRange(min=0, min_open=True), default=1.0, help='Seconds between two fleet-wide summaries')
+@click.option('--log-dir', type=click.Path(file_okay=False, dir_okay=True), required=True)
+@click.option('--edge-selection', is_flag=True, default=False, help='Every client routes its sessions between all edges, starting with its assigned one')
+@click.argument('client_args', nargs=-1, type=click.UNPROCESSED)
+def main(workers: list[str], edges: list[str], api: str, mode: str, clients: int, first_client: int, duration: float, start_delay: float,
+         report_interval: float, log_dir: str, edge_selection: bool, client_args: list[str]):
+    """Runs a client fleet on the WORKERS, CLIENT_ARGS after -- are passed on to every auto-client (e.g. -- --engine async --rate 5)."""
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(), logging.FileHandler(log_dir / 'coordinator.log')])
+
+    messages: Queue = Queue()
+    connections = [WorkerConnection(worker, messages) for worker in workers]
+    for connection in connections:
+        connection.synchronize()
+        logging.info(json.dumps({'type': 'ClockSync', 'time': time.time_ns(), 'worker': connection.address, 'offset': connection.offset, 'rtt': connection.rtt}))
+        threading.Thread(target=connection.listen, daemon=True).start()
+
+    # Every worker gets the same instant in its own clock
+    start_time = time.time_ns() + int(start_delay * 10**9)
+    assignment = assign_clients(clients, first_client, list(workers), list(edges))
+    for connection in connections:
+        assigned = [{'client': client, 'args': ['--api', api, '--mode', mode, '--edge-server', client_edges(edge, list(edges), edge_selection)] + list(client_args)}
+                    for client, edge in assignment[connection.address]]
+        connection.send({'type': 'Launch', 'start_time': start_time + connection.offset, 'clients': assigned})
+    logging.info(json.dumps({'type': 'FleetStart', 'time': time.time_ns(), 'start_time': start_time, 'clients': clients, 'workers': len(workers)}))
+
+    active_clients = {}
+    exited = 0
+    interval: dict[tuple, LatencyHistogram] = defaultdict(LatencyHistogram)
+    stop_time = start_time + int(duration * 10**9)
+    next_report = time.time_ns() + int(report_interval * 10**9)
+    with (log_dir / 'fleet.hist').open('w') as fleet_histograms:
+        while not all(connection.stopped for connection in connections):
+            now = time.time_ns()
+            # The fleet stops after the duration or once all clients finished on their own, e.g. with --test
+            if stop_time is not None and (now >= stop_time or exited == clients):
+                for connection in connections:
+                    if not connection.stopped:
+                        connection.send({'type': 'Stop'})
+                stop_time = None
+
+            deadline = next_report if stop_time is None else min(next_report, stop_time)
+            try:
+                connection, message = messages.get(timeout=max(0, deadline - now) / 10**9)
+            except Empty:
+                connection, message = None, {'type': None}
+            if message['type'] == 'Summary':
+                # Kept in the histogram format of the clients, in the clock of the coordinator
+                summary = {**message, 'type': 'Histogram', 'time': connection.to_local(message['time']), 'worker': connection.address}
+                fleet_histograms.write(json.dumps(summary) + '\n')
+                interval[(message['event'], message['cached'])].merge(LatencyHistogram.from_dict(message))
+                active_clients[connection.address] = message['clients']
+            elif message['type'] == 'FirstRequest':
+                first_request = connection.to_local(message['time'])
+                logging.info(json.dumps({'type': 'ClientStart', 'time': first_request, 'client': message['client'], 'latency': first_request - start_time,
+                                         'worker': connection.address}))
+            elif message['type'] == 'Exited':
+                exited += 1
+                logging.info(json.dumps({'type': 'ClientExit', 'time': time.time_ns(), 'client': message['client'], 'code': message['code'], 'worker': connection.address}))
+            elif message['type'] == 'Disconnected':
+                if not connection.stopped:
+                    logging.error(f'Lost worker {connection.address}: {message["error"]}')
+                connection.stopped = True
+            elif message['type'] == 'Stopped':
+                connection.stopped = True
+
+            if time.time_ns() >= next_report or all(connection.stopped for connection in connections):
+                for (event, cached), histogram in sorted(interval.items(), key=lambda item: str(item[0])):
+                    logging.info(json.dumps({'type': 'Fleet', 'time': time.time_ns(), 'event': event, 'cached': cached, 'clients': sum(active_clients.values()),
+                                             'count': histogram.total, 'p50': histogram.percentile(0.5) / 10**6, 'p99': histogram.percentile(0.99) / 10**6}))
+                interval.clear()
+                next_report += int(report_interval * 10**9)
+
+    for connection in connections:
+        connection.socket.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+../auto-client/histogram.py
\ No newline at end of file
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from threading import Thread
+
+CHUNK_SIZE = 64 * 1024
+
+
+class LatencyRelay:
+    """TCP relays on loopback that delay every chunk by the one-way delay of the link they emulate, in both directions.
+
+    All links share one asyncio loop that runs in a background thread.
+    Links with a label count the bytes they forwarded towards the connecting side and towards the target in `traffic`.
+    """
+    loop: asyncio.AbstractEventLoop
+    servers: list[asyncio.Server]
+    connections: dict[asyncio.Task, tuple[asyncio.StreamWriter, asyncio.StreamWriter]]
+    traffic: dict[str, list[int]]
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.servers = []
+        self.connections = {}
+        self.traffic = {}
+        self.thread = Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        if not self.thread.is_alive():
+            self.thread.start()
+
+    def stop(self):
+        if not self.thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self.close_servers(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def close_servers(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        # Open connections outlive their server, closing their sockets lets both directions run into EOF
+        handlers = list(self.connections)
+        for writers in self.connections.values():
+            for writer in writers:
+                writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def add_link(self, target_host: str, target_port: int, delay: float, bandwidth: float = None, label: str = None) -> int:
+        """Listens on a free loopback port that forwards to the target, `delay` in seconds, `bandwidth` in bit/s."""
+        return asyncio.run_coroutine_threadsafe(self.serve(target_host, target_port, delay, bandwidth, label), self.loop).result()
+
+    async def serve(self, target_host: str, target_port: int, delay: float, bandwidth: float = None, label: str = None) -> int:
+        # Several relays may share a label, e.g. the ones of all clients of an edge
+        traffic = None if label is None else self.traffic.setdefault(label, [0, 0])
+
+        async def handle(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+            try:
+                target_reader, target_writer = await asyncio.open_connection(target_host, target_port)
+            except OSError as e:
+                logging.warning(f'Relay could not connect to {target_host}:{target_port}: {e}')
+                client_writer.close()
+                return
+            self.connections[asyncio.current_task()] = (client_writer, target_writer)
+            try:
+                await asyncio.gather(pipe(client_reader, target_writer, delay, bandwidth, traffic, 1), pipe(target_reader, client_writer, delay, bandwidth, traffic, 0))
+            finally:
+                del self.connections[asyncio.current_task()]
+                client_writer.close()
+                target_writer.close()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        self.servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float, bandwidth: float = None, traffic: list[int] = None, direction: int = 0):
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def receive():
+        try:
+            while chunk := await reader.read(CHUNK_SIZE):
+                queue.put_nowait((loop.time() + delay, chunk))
+        except ConnectionError:
+            pass
+        queue.put_nowait((loop.time() + delay, b''))
+
+    receiver = asyncio.create_task(receive())
+    # With a bandwidth cap every chunk also occupies the link for its serialization time
+    link_free = 0.0
+    try:
+        while True:
+            due, chunk = await queue.get()
+            if bandwidth is not None:
+                link_free = due = max(link_free, due) + len(chunk) * 8 / bandwidth
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            if not chunk:
+                if writer.can_write_eof():
+                    writer.write_eof()
+                break
+            writer.write(chunk)
+            if traffic is not None:
+                traffic[direction] += len(chunk)
+            await writer.drain()
+    except ConnectionError:
+        # Closing the other connection ends the opposite direction as well
+        writer.close()
+    finally:
+        receiver.cancel()
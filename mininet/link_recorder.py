@@ -0,0 +1,95 @@
+import os
+import time
+from pathlib import Path
+from threading import Event, Thread
+
+from latency_relay import LatencyRelay
+
+LINK_STATS_LOG = 'link_stats.csv'
+LINK_COUNTERS = ['bytes_down', 'bytes_up', 'packets_down', 'packets_up']
+
+
+class InterfaceCounters:
+    """Counters of one switch port in the root namespace, read from sysfs.
+
+    `downstream` is the direction of the port ('tx' or 'rx') that carries the traffic flowing away from the origin.
+    """
+
+    def __init__(self, interface: str, downstream: str):
+        self.interface = interface
+        self.downstream = downstream
+        upstream = 'rx' if downstream == 'tx' else 'tx'
+        self.files = [open(f'/sys/class/net/{interface}/statistics/{direction}_{counter}', 'rb', buffering=0)
+                      for counter in ['bytes', 'packets'] for direction in [downstream, upstream]]
+
+    def read(self) -> list[int | None]:
+        values = []
+        for counter_file in self.files:
+            counter_file.seek(0)
+            values.append(int(counter_file.read()))
+        return values
+
+    def close(self):
+        for counter_file in self.files:
+            counter_file.close()
+
+
+class RelayCounters:
+    """Bytes the latency relays forwarded for some links, the relays do not see packets."""
+    interface = 'relay'
+
+    def __init__(self, relay: LatencyRelay, labels: list[str]):
+        self.relay = relay
+        self.labels = labels
+
+    def read(self) -> list[int | None]:
+        down = up = 0
+        for label in self.labels:
+            traffic = self.relay.traffic.get(label, (0, 0))
+            down += traffic[0]
+            up += traffic[1]
+        return [down, up, None, None]
+
+    def close(self):
+        pass
+
+
+class LinkRecorder(Thread):
+    """Samples the counters of the topology links and writes the traffic of every interval as one row per link."""
+    log_file: Path
+    links: dict[str, InterfaceCounters | RelayCounters]
+    interval: float
+
+    def __init__(self, log_file: Path, links: dict[str, InterfaceCounters | RelayCounters], interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.log_file = log_file
+        self.links = links
+        self.interval = interval
+        self.stopped = Event()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def run(self):
+        try:
+            with self.log_file.open(mode='w') as log_file:
+                log_file.write(','.join(['time', 'link', 'interface', 'interval'] + LINK_COUNTERS) + os.linesep)
+                last_time = time.time_ns()
+                last = {label: counters.read() for label, counters in self.links.items()}
+                next_sample = time.monotonic() + self.interval
+                while not self.stopped.wait(max(0.0, next_sample - time.monotonic())):
+                    next_sample += self.interval
+                    sample_time = time.time_ns()
+                    rows = []
+                    for label, counters in self.links.items():
+                        current = counters.read()
+                        # Only the traffic of the interval is kept, the totals include everything the link carried before the run
+                        deltas = ['' if value is None else value - last_value for value, last_value in zip(current, last[label])]
+                        last[label] = current
+                        rows.append(','.join(map(str, [sample_time, label, counters.interface, sample_time - last_time] + deltas)))
+                    last_time = sample_time
+                    log_file.write(os.linesep.join(rows) + os.linesep)
+        finally:
+            for counters in self.links.values():
+                counters.close()
@@ -9,26 +9,41 @@ import signal
 import subprocess
 import sys
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from ipaddress import IPv4Address, IPv4Network, ip_network
 from pathlib import Path
-from threading import Thread
+from threading import Event, Lock, Thread
 from typing import Iterator, Iterable, Tuple
 
 import click
 import psutil
-from mininet.link import TCLink
-from mininet.net import Mininet
-from mininet.node import Node, CPULimitedHost
-from mininet.topo import Topo
 from psutil import Process
 
+try:
+    from mininet.link import TCLink
+    from mininet.net import Mininet
+    from mininet.node import Controller, Node, CPULimitedHost
+    from mininet.topo import Topo
+except ImportError:
+    # Only --backend local works without Mininet
+    TCLink = Mininet = Controller = Node = CPULimitedHost = None
+    Topo = object
+
+from capacity_search import search_capacity
+from latency_relay import LatencyRelay
+from link_recorder import LINK_STATS_LOG, InterfaceCounters, LinkRecorder, RelayCounters
+from orchestrate import COMPLETE_MARKER
+
 AUTO_CLIENT_BIN = Path('.') / 'auto-client' / 'main.py'
+AUTO_CLIENT_ZYGOTE = Path('.') / 'auto-client' / 'zygote.py'
 EDGE_SERVER_DIR = Path('.') / 'edge-cache-ts'
 ORIGIN_SERVER_DIR = Path('.') / 'origin-ts'
+READINESS_BIN = Path('.') / 'mininet' / 'readiness.py'
 random.seed(42)
 PROCESS_START_TIME = time.time_ns()
-logging_active = True
-OBSERVED_PROCESSES: list[Tuple[str, Process]] = []
+RESOURCE_STATS_LOG = 'resource_stats.csv'
 
 if not AUTO_CLIENT_BIN.exists():
     raise FileNotFoundError(AUTO_CLIENT_BIN)
@@ -47,14 +62,36 @@ class OriginEdgeTopology(Topo):
     origin_processes: list[subprocess.Popen]
     client_processes: list[subprocess.Popen]
     edge_processes: list[subprocess.Popen]
-
-    def __init__(self, num_clients=5, *args, **params):
+    resource_sampler: 'ResourceSampler | None'
+    client_starts: dict[int, int]
+    cores: range
+    launcher: str
+    zygotes: dict[str, 'Zygote']
+    hosts_per_class: int | None
+    distance_classes: int
+    client_host_mapping: list[str]
+
+    def __init__(self, num_clients=5, partition: int = None, cores: range = None, launcher: str = 'zygote', hosts_per_class: int = None,
+                 distance_classes: int = 5, *args, **params):
         self.num_clients = num_clients
-        self.num_cores = multiprocessing.cpu_count()
+        self.launcher = launcher
+        self.zygotes = {}
+        # Without hosts_per_class every client gets its own host, otherwise the clients share a fixed pool of hosts
+        self.hosts_per_class = hosts_per_class
+        self.distance_classes = distance_classes
+        self.client_host_mapping = []
+        # Concurrent topologies on one machine need distinct node names, the network namespaces isolate IPs and ports
+        self.partition = partition
+        self.prefix = '' if partition is None else f'p{partition}'
+        self.cores = cores if cores is not None else range(2, multiprocessing.cpu_count())
         self.edge_servers = []
         self.edge_processes = []
         self.origin_processes = []
         self.client_processes = []
+        self.resource_sampler = None
+        self.client_starts = {}
+        # Passed on to every client, e.g. --phase-timing
+        self.client_options = []
         super().__init__(*args, **params)
 
     def re_model(self, x) -> str:
@@ -66,14 +103,14 @@ class OriginEdgeTopology(Topo):
         self.origin_edge_network = ip_network('10.0.0.0/16')
         origin_edge_network_hosts = self.origin_edge_network.hosts()
 
-        self.origin = self.addHost('origin', cores=2, ip=f'{next(origin_edge_network_hosts)}/16')
-        self.origin_edge_switch = self.addSwitch('s0')
+        self.origin = self.addHost(f'{self.prefix}origin', cores=self.cores[0], ip=f'{next(origin_edge_network_hosts)}/16')
+        self.origin_edge_switch = self.add_switch(0)
         self.addLink(self.origin, self.origin_edge_switch)
 
         self.edge_server_origin_ips = [next(origin_edge_network_hosts) for _ in range(5)]
-        current_core = 3
+        current_core = self.cores[1]
         for i, ip in enumerate(self.edge_server_origin_ips):
-            self.edge_servers.append(self.addHost(f'e{i + 1}', cores=[current_core, current_core+1], ip=f'{ip}/16'))
+            self.edge_servers.append(self.addHost(f'{self.prefix}e{i + 1}', cores=[current_core, current_core+1], ip=f'{ip}/16'))
             current_core += 2
 
         # Origin to Edge Server Links
@@ -81,7 +118,7 @@ class OriginEdgeTopology(Topo):
             link_delay = self.re_model(edge_distance)
             self.addLink(self.origin_edge_switch, edge_server, delay=link_delay, params2={'ip': f'{edge_ip}/16'}, cls=TCLink)
 
-        self.edge_client_switches = [self.addSwitch(f's{i + 1}') for i in range(5)]
+        self.edge_client_switches = [self.add_switch(i + 1) for i in range(5)]
 
         self.edge_server_net_gen = [ip_network(f'10.{i + 1}.0.0/16').hosts() for i in range(5)]
         self.edge_server_ips = [next(net_gen) for net_gen in self.edge_server_net_gen]
@@ -91,78 +128,209 @@ class OriginEdgeTopology(Topo):
 
         self.client_edge_mapping = [ i % len(self.edge_servers) for i in range(self.num_clients)]
 
-        client_cores_cycle = itertools.cycle(list(range(current_core, self.num_cores)))
+        client_cores_cycle = itertools.cycle(list(range(current_core, self.cores.stop)))
+
+        if self.hosts_per_class is not None:
+            self.build_client_pool(client_cores_cycle)
+            return
 
         for i, client_edge_mapping in enumerate(self.client_edge_mapping):
             km_distance = random.randint(50, 500)
             client_delay = self.re_model(km_distance)
 
-            new_client = self.addHost(f'x{i}', cores=next(client_cores_cycle), ip=f'{next(self.edge_server_net_gen[client_edge_mapping])}/16')
+            new_client = self.addHost(f'{self.prefix}x{i}', cores=next(client_cores_cycle), ip=f'{next(self.edge_server_net_gen[client_edge_mapping])}/16')
             self.addLink(new_client, self.edge_client_switches[client_edge_mapping], delay=client_delay, cls=TCLink)
-
-    def start(self, net: Mininet, log_dir: Path, stats: bool):
-        edge_servers: list[Node] = [net.get(edge_server) for edge_server in self.edge_servers]
-
-        origin_host = net.get(self.origin)
-        origin_ip = origin_host.IP()
-
+            self.client_host_mapping.append(new_client)
+
+    def distance_class(self, km_distance: int) -> int:
+        # Equally wide classes between 50 and 500km, the range the client distances are drawn from
+        return min((km_distance - 50) * self.distance_classes // 451, self.distance_classes - 1)
+
+    def build_client_pool(self, client_cores_cycle: Iterator[int]):
+        """Builds hosts_per_class client hosts per edge and distance class, every client runs on one of the hosts of its class."""
+        class_width = 450 / self.distance_classes
+        pool = {}
+        for edge in range(len(self.edge_servers)):
+            for distance_class in range(self.distance_classes):
+                # The link of a class has the delay of the center of its class
+                client_delay = self.re_model(50 + (distance_class + 0.5) * class_width)
+                hosts = pool[(edge, distance_class)] = []
+                for n in range(self.hosts_per_class):
+                    new_client = self.addHost(f'{self.prefix}x{edge}c{distance_class}h{n}', cores=next(client_cores_cycle),
+                                              ip=f'{next(self.edge_server_net_gen[edge])}/16')
+                    self.addLink(new_client, self.edge_client_switches[edge], delay=client_delay, cls=TCLink)
+                    hosts.append(new_client)
+
+        placed = {key: 0 for key in pool}
+        for client_edge_mapping in self.client_edge_mapping:
+            key = (client_edge_mapping, self.distance_class(random.randint(50, 500)))
+            self.client_host_mapping.append(pool[key][placed[key] % self.hosts_per_class])
+            placed[key] += 1
+
+    def add_switch(self, i: int) -> str:
+        if self.partition is None:
+            return self.addSwitch(f's{i}')
+        # The default dpid is taken from the digits of the name, which would collide between partitions
+        return self.addSwitch(f'{self.prefix}s{i}', dpid=f'{self.partition + 1:04x}{i + 1:012x}')
+
+    def popen(self, net: Mininet, host: str, args: list[str], **params) -> subprocess.Popen:
+        return net.get(host).popen(args, **params)
+
+    def client_host(self, num_of_client: int) -> str:
+        if num_of_client < len(self.client_host_mapping):
+            return self.client_host_mapping[num_of_client]
+        return f'{self.prefix}x{num_of_client}'
+
+    def client_edge_address(self, num_of_client: int) -> str:
+        return f'{self.edge_server_ips[self.client_edge_mapping[num_of_client]]}:8005'
+
+    def origin_port(self) -> int:
+        return 3000
+
+    def edge_ports(self, i: int) -> Tuple[int, int]:
+        # HTTP and Redis port, every edge server has its own host
+        return 8005, 8006
+
+    def edge_env(self, net: Mininet, i: int) -> dict[str, str]:
+        origin_ip = net.get(self.origin).IP()
+        return {
+            'HOST_NAME': f'{self.edge_server_origin_ips[i]}',
+            'EDGE_SERVERS': ','.join([f'{ip}:{8005}' for ip in self.edge_server_origin_ips]),
+            'ORIGIN': f'{origin_ip}:3000',
+        }
+
+    def recorded_links(self, net: Mininet) -> dict[str, InterfaceCounters]:
+        """Counters of the origin and edge links, downstream is the direction away from the origin."""
+        def switch_port(switch: str, host: str) -> str:
+            # Switch ports live in the root namespace, the host ends of the links in the namespaces of the hosts
+            return net.get(switch).connectionsTo(net.get(host))[0][0].name
+
+        links = {'origin': InterfaceCounters(switch_port(self.origin_edge_switch, self.origin), 'rx')}
+        for i, (edge_server, edge_switch) in enumerate(zip(self.edge_servers, self.edge_client_switches)):
+            links[f'origin-e{i + 1}'] = InterfaceCounters(switch_port(self.origin_edge_switch, edge_server), 'tx')
+            links[f'e{i + 1}-clients'] = InterfaceCounters(switch_port(edge_switch, edge_server), 'rx')
+        return links
+
+    def start(self, net: Mininet, log_dir: Path, stats: bool, startup_timeout: float = 30.0):
         sub_env = os.environ.copy()
-        sub_env['PORT'] = '3000'
+        sub_env['PORT'] = f'{self.origin_port()}'
         origin_log = (log_dir / 'origin.log').open(mode='w')
         origin_err_log = (log_dir / 'origin.err.log').open(mode='w')
-        origin_process = origin_host.popen(['src/index.ts'], cwd=ORIGIN_SERVER_DIR, env=sub_env, stdout=origin_log, stderr=origin_err_log)
+        origin_start = time.time_ns()
+        origin_process = self.popen(net, self.origin, ['src/index.ts'], cwd=ORIGIN_SERVER_DIR, env=sub_env, stdout=origin_log, stderr=origin_err_log)
         self.origin_processes.append(origin_process)
-        time.sleep(2)
+        self.wait_ready(net, self.origin, 'origin', origin_start, startup_timeout, http_urls=[f'http://127.0.0.1:{self.origin_port()}/'])
 
-        for i, edge_server in enumerate(edge_servers):
+        edge_starts = []
+        for i, edge_server in enumerate(self.edge_servers):
+            http_port, redis_port = self.edge_ports(i)
             sub_env = os.environ.copy()
-            sub_env['HOST_NAME'] = f'{self.edge_server_origin_ips[i]}'
-            sub_env['EDGE_SERVERS'] = ','.join([f'{ip}:{8005}' for ip in self.edge_server_origin_ips])
-            sub_env['ORIGIN'] = f'{origin_ip}:3000'
-            sub_env['PORT'] = f'8005'
-            sub_env['REDIS_PORT'] = f'8006'
+            sub_env.update(self.edge_env(net, i))
+            sub_env['PORT'] = f'{http_port}'
+            sub_env['REDIS_PORT'] = f'{redis_port}'
             edge_server_log = (log_dir / f"edge_server_{i}.log").open(mode='w')
             edge_server_err_log = (log_dir / f"edge_server_{i}.err.log").open(mode='w')
-            edge_server_process = edge_server.popen(['src/index.ts'], cwd=EDGE_SERVER_DIR, env=sub_env, stderr=edge_server_err_log, stdout=edge_server_log)
+            edge_starts.append(time.time_ns())
+            edge_server_process = self.popen(net, edge_server, ['src/index.ts'], cwd=EDGE_SERVER_DIR, env=sub_env, stderr=edge_server_err_log, stdout=edge_server_log)
             self.edge_processes.append(edge_server_process)
             if stats:
-                self.start_stat_recording(edge_server, edge_server_process.pid, log_dir, f"edge_server_{i}", self.edge_processes)
+                self.start_stat_recording(edge_server_process.pid, f"edge_server_{i}")
 
         if stats:
-            self.start_stat_recording(origin_host, origin_process.pid, log_dir, f"origin", self.origin_processes)
-
-    def start_client(self, net: Mininet, num_of_client: int, api: str, mode: str, log_dir: Path, stats: bool):
-        edge_server_ip = self.edge_server_ips[self.client_edge_mapping[num_of_client]]
-
-        client_log = (log_dir / f"client_{num_of_client}.log").open(mode='w')
-        client_err_log = (log_dir / f"client_{num_of_client}.err.log").open(mode='w')
-
-        client_node: CPULimitedHost = net.get(f'x{num_of_client}')
-
-        client_process = client_node.popen([f'{AUTO_CLIENT_BIN}', '--api', api, '--mode', mode, '--edge-server', f'{edge_server_ip}:8005', '--client-number', f'{num_of_client}'], env=os.environ.copy(), stdout=client_log, stderr=client_err_log)
+            self.start_stat_recording(origin_process.pid, f"origin")
+
+        # All edge servers boot at the same time, each one is ready once its HTTP server and its Redis answer
+        with ThreadPoolExecutor(max_workers=len(self.edge_servers)) as executor:
+            probes = [executor.submit(self.wait_ready, net, edge_server, f'edge_server_{i}', edge_start, startup_timeout,
+                                      http_urls=[f'http://127.0.0.1:{self.edge_ports(i)[0]}/'], redis_addresses=[f'127.0.0.1:{self.edge_ports(i)[1]}'])
+                      for i, (edge_server, edge_start) in enumerate(zip(self.edge_servers, edge_starts))]
+            for probe in probes:
+                probe.result()
+
+    def wait_ready(self, net: Mininet, host: str, component: str, start_time: int, timeout: float, http_urls: list[str] = (), redis_addresses: list[str] = ()):
+        probe_args = [sys.executable, str(READINESS_BIN), '--timeout', f'{timeout}']
+        probe_args += [arg for url in http_urls for arg in ['--http', url]]
+        probe_args += [arg for address in redis_addresses for arg in ['--redis', address]]
+        probe = self.popen(net, host, probe_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output, _ = probe.communicate()
+        ready = probe.returncode == 0
+        logging.info(json.dumps({'type': 'Startup', 'time': time.time_ns(), 'component': component, 'latency': time.time_ns() - start_time, 'ready': ready}))
+        if not ready:
+            raise TimeoutError(f'{component} was not ready after {timeout}s: {output.decode(errors="backslashreplace").strip()}')
+
+    def prewarm_clients(self, net: Mininet, first_client: int, num_clients: int, log_dir: Path):
+        """Starts the zygotes of the next clients, so their imports are done before the scale step needs them."""
+        if self.launcher != 'zygote':
+            return
+        for num_of_client in range(first_client, min(first_client + num_clients, self.num_clients)):
+            host = self.client_host(num_of_client)
+            if host not in self.zygotes:
+                self.zygotes[host] = self.start_zygote(net, num_of_client, log_dir)
+
+    def start_zygote(self, net: Mininet, num_of_client: int, log_dir: Path) -> 'Zygote':
+        host = self.client_host(num_of_client)
+        zygote_name = num_of_client if self.hosts_per_class is None else host
+        zygote_err_log = (log_dir / f"zygote_{zygote_name}.err.log").open(mode='a')
+        process = self.popen(net, host, [f'{AUTO_CLIENT_ZYGOTE}'], env=os.environ.copy(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=zygote_err_log)
+        return Zygote(process, host)
+
+    def start_client(self, net: Mininet, num_of_client: int, api: str, mode: str, log_dir: Path, stats: bool, histogram: bool = False, scale_time: int = None):
+        scale_time = scale_time or time.time_ns()
+
+        # A client that is started again on the same host continues its logs
+        restarts = self.client_starts.get(num_of_client, 0)
+        self.client_starts[num_of_client] = restarts + 1
+        log_mode = 'w' if restarts == 0 else 'a'
+        client_log_path = log_dir / f"client_{num_of_client}.log"
+        client_err_log_path = log_dir / f"client_{num_of_client}.err.log"
+
+        client_args = ['--api', api, '--mode', mode, '--edge-server', self.client_edge_address(num_of_client), '--client-number', f'{num_of_client}']
+        client_args += self.client_options
+        if histogram:
+            histogram_name = f"client_{num_of_client}.hist" if restarts == 0 else f"client_{num_of_client}.{restarts}.hist"
+            client_args += ['--histogram-file', f'{(log_dir / histogram_name).absolute()}']
+
+        if self.launcher == 'zygote':
+            host = self.client_host(num_of_client)
+            launch = {'args': client_args, 'stdout': f'{client_log_path.absolute()}', 'stderr': f'{client_err_log_path.absolute()}', 'append': restarts > 0}
+            if self.hosts_per_class is None:
+                # The zygote serves only this client, stopping the zygote stops the client
+                zygote = self.zygotes.pop(host, None) or self.start_zygote(net, num_of_client, log_dir)
+                client_process = zygote.process
+            else:
+                zygote = self.zygotes.get(host) or self.start_zygote(net, num_of_client, log_dir)
+                self.zygotes[host] = zygote
+                client_process = ZygoteClient()
+            zygote.launch(num_of_client, scale_time, launch, client_process if self.hosts_per_class is not None else None)
+        else:
+            client_log = client_log_path.open(mode=log_mode)
+            client_err_log = client_err_log_path.open(mode=log_mode)
+            client_process = self.popen(net, self.client_host(num_of_client), [f'{AUTO_CLIENT_BIN}'] + client_args, env=os.environ.copy(), stdout=client_log, stderr=client_err_log)
         if stats:
-            self.start_stat_recording(client_node, client_process.pid, log_dir, f"client_{num_of_client}", self.client_processes)
+            self.start_stat_recording(client_process.pid, f"client_{num_of_client}")
 
 
         self.client_processes.append(client_process)
 
-    def start_stat_recording(self, node: Node, pid: int, log_dir:Path, file_name: str, add_to_list: list):
-        logging.info(json.dumps({'type': 'Stats', 'time': time.time_ns(), 'file': f"{file_name}_stats", "pid": pid}))
-        # global OBSERVED_PROCESSES
-        # OBSERVED_PROCESSES.append(( file_name, psutil.Process(pid)))
+    def stop_client(self):
+        client_process = self.client_processes.pop()
+        client_process.send_signal(signal.SIGINT)
+        self.wait_process(client_process)
 
-        # stat_cpu_log = log_dir / f"{file_name}.cpu"
-        # stat_mem_log = log_dir / f"{file_name}.mem"
-        stat_log = log_dir / f"{file_name}_stats.log"
-        stat_err_log = (log_dir / f"{file_name}_stats.err.log").open(mode='w')
-        stat_process = node.popen(['psrecord', f'{pid}', '--log', f'{stat_log.absolute()}', '--interval', '1', '--log-format', 'csv', '--include-children', '--include-io'], stdout=stat_err_log, stderr=stat_err_log, env=os.environ.copy())
-        add_to_list.append(stat_process)
-        #
-        # yield subprocess.Popen(f'pidstat -p {pid} -I 1 -u > {stat_cpu_log.absolute()}.log 2> {stat_cpu_log.absolute()}.err.log', shell=True)
-        # yield subprocess.Popen(f'pidstat -p {pid} -I 1 -r > {stat_mem_log.absolute()}.log 2> {stat_mem_log.absolute()}.err.log', shell=True)
+    def start_stat_recording(self, pid: int, name: str):
+        logging.info(json.dumps({'type': 'Stats', 'time': time.time_ns(), 'file': RESOURCE_STATS_LOG, 'name': name, "pid": pid}))
+        self.resource_sampler.register(name, pid)
 
 
     def stop(self):
+        # The Redis servers outlive their edge server, the next experiment on the same network would find their cache entries
+        server_children = []
+        for server_process in self.edge_processes + self.origin_processes:
+            try:
+                server_children += get_all_children(psutil.Process(server_process.pid))
+            except psutil.NoSuchProcess:
+                pass
+
         for client_process in self.client_processes:
             client_process.send_signal(signal.SIGINT)
 
@@ -179,6 +347,30 @@ class OriginEdgeTopology(Topo):
             origin_process.send_signal(signal.SIGINT)
             origin_process.wait()
 
+        for zygote in self.zygotes.values():
+            zygote.process.stdin.close()
+            self.wait_process(zygote.process)
+
+        for child in server_children:
+            try:
+                child.terminate()
+            except psutil.NoSuchProcess:
+                pass
+        _, alive = psutil.wait_procs(server_children, timeout=5)
+        for child in alive:
+            try:
+                child.kill()
+            except psutil.NoSuchProcess:
+                pass
+        psutil.wait_procs(alive, timeout=5)
+
+        # The network stays up and can be started again for the next experiment
+        self.zygotes = {}
+        self.client_processes = []
+        self.edge_processes = []
+        self.origin_processes = []
+        self.client_starts = {}
+
 
     def wait_process(self, p: subprocess.Popen):
         try:
@@ -187,6 +379,86 @@ class OriginEdgeTopology(Topo):
             logging.error(f'Timeout while waiting for process: {e}')
 
 
+class LocalTopology(OriginEdgeTopology):
+    """Runs origin, edges and clients as local processes, the links are emulated by latency relays on loopback."""
+    relay: LatencyRelay
+    edge_link_delays: list[float]
+    client_delays: list[float]
+    relay_ports: dict[tuple, int]
+
+    def __init__(self, num_clients=5, launcher: str = 'zygote', base_port: int = 20000, bandwidth: float = None):
+        self.base_port = base_port
+        self.bandwidth = bandwidth
+        self.relay = LatencyRelay()
+        self.client_delays = []
+        self.relay_ports = {}
+        super().__init__(num_clients, launcher=launcher)
+        if not self.client_delays:
+            # Topo only calls build when Mininet is installed
+            self.build()
+
+    def link_delay(self, x) -> float:
+        # One-way delay in seconds, like the delay of a TCLink
+        return float(self.re_model(x).removesuffix('ms')) / 1000
+
+    def build(self):
+        self.origin = 'origin'
+        self.edge_servers = [f'e{i + 1}' for i in range(5)]
+        self.edge_link_delays = [self.link_delay(edge_distance) for edge_distance in [0, 1000, 1000, 1000, 1000]]
+        self.client_edge_mapping = [i % len(self.edge_servers) for i in range(self.num_clients)]
+        self.client_delays = [self.link_delay(random.randint(50, 500)) for _ in self.client_edge_mapping]
+
+    def link(self, key: tuple, target_port: int, delay: float, label: str) -> int:
+        # Relays outlive the servers, so the network can be reused for the next experiment
+        if key not in self.relay_ports:
+            self.relay_ports[key] = self.relay.add_link('127.0.0.1', target_port, delay, self.bandwidth, label)
+        return self.relay_ports[key]
+
+    def recorded_links(self, net: None) -> dict[str, RelayCounters]:
+        # Invalidations between edges have their own relays, on Mininet they share the origin-edge links
+        labels = [f'origin-e{i + 1}' for i in range(len(self.edge_servers))]
+        links = {'origin': RelayCounters(self.relay, labels)}
+        for i in range(len(self.edge_servers)):
+            links[f'origin-e{i + 1}'] = RelayCounters(self.relay, [f'origin-e{i + 1}'])
+            links[f'e{i + 1}-edges'] = RelayCounters(self.relay, [f'e{i + 1}-edges'])
+            links[f'e{i + 1}-clients'] = RelayCounters(self.relay, [f'e{i + 1}-clients'])
+        return links
+
+    def popen(self, net: None, host: str, args: list[str], **params) -> subprocess.Popen:
+        return subprocess.Popen(args, **params)
+
+    def client_edge_address(self, num_of_client: int) -> str:
+        edge = self.client_edge_mapping[num_of_client]
+        return f'127.0.0.1:{self.link(("client", num_of_client), self.edge_ports(edge)[0], self.client_delays[num_of_client], f"e{edge + 1}-clients")}'
+
+    def origin_port(self) -> int:
+        return self.base_port
+
+    def edge_ports(self, i: int) -> Tuple[int, int]:
+        return self.base_port + 1 + 2 * i, self.base_port + 2 + 2 * i
+
+    def edge_env(self, net: None, i: int) -> dict[str, str]:
+        # Invalidations between two edges cross the links of both of them, an edge recognizes itself by its own address
+        edge_servers = [f'127.0.0.1:{self.edge_ports(j)[0]}' if j == i else
+                        f'127.0.0.1:{self.link(("edge", i, j), self.edge_ports(j)[0], self.edge_link_delays[i] + self.edge_link_delays[j], f"e{i + 1}-edges")}'
+                        for j in range(len(self.edge_servers))]
+        return {
+            'HOST_NAME': '127.0.0.1',
+            'EDGE_SERVERS': ','.join(edge_servers),
+            'ORIGIN': f'127.0.0.1:{self.link(("origin", i), self.origin_port(), self.edge_link_delays[i], f"origin-e{i + 1}")}',
+        }
+
+    def start(self, net: None, log_dir: Path, stats: bool, startup_timeout: float = 30.0):
+        self.relay.start()
+        super().start(net, log_dir, stats, startup_timeout)
+
+    def close(self):
+        for process in self.client_processes + [zygote.process for zygote in self.zygotes.values()] + self.edge_processes + self.origin_processes:
+            if process.poll() is None:
+                process.kill()
+        self.relay.stop()
+
+
 def get_all_children(pr) -> list[Process]:
     try:
         return pr.children(recursive=True)
@@ -194,121 +466,321 @@ def get_all_children(pr) -> list[Process]:
         logging.error(f'Could not get process children', exc_info=e)
         return []
 
-def logging_thread(log_dir: Path):
-    with (log_dir / 'interface_stats.log').open(mode='w') as log_file:
-        while logging_active:
-            # Interface Statistics
-            net_stats: dict = psutil.net_io_counters(pernic=True)
-            log_file.write(json.dumps({'type': 'Interfaces', 'time': time.time_ns(), 'stats': net_stats}) + os.linesep)
-
-            # Process Stats
-            # for obs_name, pr in OBSERVED_PROCESSES:
-            #     try:
-            #         pr_status = pr.status()
-            #     except psutil.NoSuchProcess:
-            #         logging.error(f'Process {pr} did not exist')
-            #         continue
-            #     if pr_status in [psutil.STATUS_ZOMBIE, psutil.STATUS_DEAD]:
-            #         print(f"Process {pr} finished seconds)")
-            #         continue
-            #
-            #     try:
-            #         current_cpu = pr.cpu_percent()
-            #         current_mem = pr.memory_info()
-            #         mem_percent_real = pr.memory_percent(memtype="rss")
-            #         mem_percent_virt = pr.memory_percent(memtype="vms")
-            #     except Exception as e:
-            #         logging.error(f'Error retrieving process stats', exc_info=e)
-            #         continue
-            #     current_mem_real = current_mem.rss / 1024.0 ** 2
-            #     current_mem_virtual = current_mem.vms / 1024.0 ** 2
-            #     n_proc = 1
-            #
-            #     # Get information for children
-            #
-            #     for child in get_all_children(pr):
-            #         try:
-            #             current_cpu += child.cpu_percent()
-            #             current_mem = child.memory_info()
-            #             current_mem_real += current_mem.rss / 1024.0 ** 2
-            #             current_mem_virtual += current_mem.vms / 1024.0 ** 2
-            #             mem_percent_real += child.memory_percent(memtype="rss")
-            #             mem_percent_virt += child.memory_percent(memtype="vms")
-            #             n_proc += 1
-            #         except Exception as e:
-            #             logging.error(f'Error retrieving process stats', exc_info=e)
-            #             continue
-            #
-            #     log_file.write(json.dumps({'type': 'Process', 'name': obs_name, 'n_proc': n_proc, 'time': time.time_ns(), 'pid': pr.pid, 'cpu_per_core': current_cpu, 'mem_real': current_mem_real, 'mem_virtual': current_mem_virtual,
-            #                                'mem_real_perc': mem_percent_real, 'mem_virtual_perc': mem_percent_virt}) + os.linesep)
-
-            time.sleep(1)
 
+class ZygoteClient:
+    """A client forked by a zygote that serves several clients, signalled by its own pid once the zygote reported it."""
 
-@click.command()
-@click.option('--api', type=click.Choice(['flights', 'forums']), required=True)
-@click.option('--mode', type=click.Choice(['proxy', 'cache', 'ttl', 'crdt']), required=True)
-@click.option('--scale-interval', type=click.IntRange(min=0), default=5)
-@click.option('--scale-size', type=click.IntRange(min=1), default=1)
-@click.option('--scale-times', type=click.IntRange(min=1), default=500)
-@click.option('--log-dir', type=click.Path(file_okay=False, dir_okay=True), required=True)
-@click.option('--stats', type=bool, default=False)
-def main(api: str, mode: str, scale_interval: int, scale_size: int, scale_times: int, log_dir: Path, stats: bool):
-    log_dir = Path(log_dir)
-    log_dir.mkdir(exist_ok=True, parents=True)
+    def __init__(self):
+        self.forked = Event()
+        self.client_pid = None
 
+    def launched(self, pid: int):
+        self.client_pid = pid
+        self.forked.set()
 
-    logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(), logging.FileHandler(log_dir / 'mininet.log', errors='backslashreplace')])
+    @property
+    def pid(self) -> int | None:
+        self.forked.wait(30)
+        return self.client_pid
 
-    logging.info(f'Running api {api} in mode {mode} with interval {scale_interval} and size {scale_size} times {scale_times}')
+    def send_signal(self, signum: int):
+        if self.pid is None:
+            return
+        try:
+            os.kill(self.pid, signum)
+        except ProcessLookupError:
+            pass
 
-    maximum_clients = scale_times * scale_size
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
 
-    topo = OriginEdgeTopology(num_clients=maximum_clients)
+    def poll(self) -> int | None:
+        # The exit code belongs to the zygote, which reaps its clients
+        return None if self.client_pid is None or psutil.pid_exists(self.client_pid) else 0
 
-    logging.info(f'Creating Mininet Topology')
-    net = Mininet(topo=topo, autoPinCpus=False, host=CPULimitedHost, cleanup=True)
-    logging.info(f'Starting Mininet')
+    def wait(self, timeout: float = None):
+        if self.pid is None:
+            raise subprocess.TimeoutExpired('client of a zygote', timeout)
+        try:
+            psutil.Process(self.pid).wait(timeout)
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.TimeoutExpired:
+            raise subprocess.TimeoutExpired(f'client {self.pid}', timeout)
+
+
+class Zygote:
+    """A pre-warmed zygote on a client host, logs when each of the clients it forked sent its first request."""
+    process: subprocess.Popen
+    host: str
+    pending: deque
+    forked: dict[int, tuple[int, int, int]]
+
+    def __init__(self, process: subprocess.Popen, host: str):
+        self.process = process
+        self.host = host
+        self.pending = deque()
+        self.forked = {}
+        Thread(target=self.read_reports, daemon=True).start()
+
+    def launch(self, num_of_client: int, scale_time: int, command: dict, client: ZygoteClient = None):
+        # The zygote answers the launches in order, afterwards the pid identifies the client
+        self.pending.append((num_of_client, scale_time, client))
+        self.process.stdin.write((json.dumps(command) + os.linesep).encode())
+        self.process.stdin.flush()
+
+    def read_reports(self):
+        for line in self.process.stdout:
+            message = json.loads(line)
+            if message['type'] == 'Launched':
+                num_of_client, scale_time, client = self.pending.popleft()
+                self.forked[message['pid']] = (num_of_client, scale_time, message['time'])
+                if client is not None:
+                    client.launched(message['pid'])
+            elif message['type'] == 'FirstRequest' and message['pid'] in self.forked:
+                num_of_client, scale_time, launched = self.forked.pop(message['pid'])
+                logging.info(json.dumps({'type': 'ClientStart', 'time': time.time_ns(), 'client': num_of_client, 'host': self.host, 'scale_time': scale_time,
+                                         'launched': launched, 'first_request': message['time'], 'latency': message['time'] - scale_time}))
+
+
+class ResourceSampler(Thread):
+    """Samples CPU, memory and I/O of all observed processes and their children in one thread."""
+    log_file: Path
+    interval: float
+    observed: dict[str, Process]
+    last_cpu: dict[str, Tuple[float, float]]
+
+    def __init__(self, log_file: Path, interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.log_file = log_file
+        self.interval = interval
+        self.observed = {}
+        self.last_cpu = {}
+        self.lock = Lock()
+        self.stopped = Event()
+
+    def register(self, name: str, pid: int):
+        try:
+            with self.lock:
+                self.observed[name] = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            logging.error(f'Process {pid} of {name} did not exist')
 
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def sample(self, name: str, pr: Process, now: float) -> list | None:
+        if not pr.is_running():
+            return None
+        n_proc = 0
+        cpu_time = 0.0
+        mem_real = mem_virtual = 0
+        read_count = write_count = read_bytes = write_bytes = 0
+        for process in [pr] + get_all_children(pr):
+            try:
+                with process.oneshot():
+                    cpu_times = process.cpu_times()
+                    memory = process.memory_info()
+                    io = process.io_counters()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                continue
+            n_proc += 1
+            cpu_time += cpu_times.user + cpu_times.system
+            mem_real += memory.rss
+            mem_virtual += memory.vms
+            read_count += io.read_count
+            write_count += io.write_count
+            read_bytes += io.read_bytes
+            write_bytes += io.write_bytes
+        if n_proc == 0:
+            return None
+
+        # CPU usage in percent of one core since the last pass, like psrecord
+        last_cpu_time, last_time = self.last_cpu.get(name, (cpu_time, now))
+        self.last_cpu[name] = (cpu_time, now)
+        cpu = max(cpu_time - last_cpu_time, 0) / (now - last_time) * 100 if now > last_time else 0.0
+        return [name, pr.pid, n_proc, f'{cpu:.1f}', f'{mem_real / 1024.0 ** 2:.1f}', f'{mem_virtual / 1024.0 ** 2:.1f}', read_count, write_count, read_bytes, write_bytes]
+
+    def run(self):
+        with self.log_file.open(mode='w') as log_file:
+            log_file.write('time,name,pid,nproc,cpu,mem_real,mem_virtual,read_count,write_count,read_bytes,write_bytes,pass_duration' + os.linesep)
+            while not self.stopped.wait(self.interval):
+                pass_start = time.perf_counter()
+                sample_time = time.time_ns()
+                with self.lock:
+                    observed = list(self.observed.items())
+                rows = []
+                for name, pr in observed:
+                    row = self.sample(name, pr, pass_start)
+                    if row is not None:
+                        rows.append(row)
+                pass_duration = time.perf_counter() - pass_start
+                for row in rows:
+                    log_file.write(','.join(map(str, [sample_time] + row + [f'{pass_duration * 1000:.3f}'])) + os.linesep)
+                log_file.flush()
+
+
+def parse_cores(ctx, param, value: str | None) -> range | None:
+    if value is None:
+        return None
+    first, _, last = value.partition('-')
     try:
-        net.start()
+        cores = range(int(first), int(last or first) + 1)
+    except ValueError:
+        raise click.BadParameter(f'{value} is not a core range like 2-17')
+    # origin, two cores for each of the five edge servers and at least one for the clients
+    if len(cores) < 12:
+        raise click.BadParameter(f'{value} has {len(cores)} cores, at least 12 are needed')
+    return cores
+
+
+def run_experiment(topo: OriginEdgeTopology, net: Mininet, api: str, mode: str, log_dir: Path, scale_interval: int, scale_size: int, scale_times: int,
+                   stats: bool, stats_interval: float, link_interval: float, search: str, slo_p99: float, slo_error_rate: float, search_resolution: int,
+                   startup_timeout: float):
+    experiment_start = time.time_ns()
+    logging.info(f'Running api {api} in mode {mode} with interval {scale_interval} and size {scale_size} times {scale_times}')
 
-        if stats:
-            interface_logging_thread = Thread(target=logging_thread, args=[log_dir])
-            interface_logging_thread.start()
+    maximum_clients = scale_times * scale_size
 
+    link_recorder = None
+    if stats:
+        link_recorder = LinkRecorder(log_dir / LINK_STATS_LOG, topo.recorded_links(net), link_interval)
+        link_recorder.start()
+        topo.resource_sampler = ResourceSampler(log_dir / RESOURCE_STATS_LOG, stats_interval)
+        topo.resource_sampler.start()
 
-        logging.info(f'Starting Origin and Edge Servers')
-        topo.start(net, log_dir, stats)
-        time.sleep(1)
 
-        ploss = net.ping([net.get(h) for h in ['origin', 'e1', 'e2', 'e3', 'e4', 'e5']], timeout='300ms')
+    logging.info(f'Starting Origin and Edge Servers')
+    topo.start(net, log_dir, stats, startup_timeout)
+
+    if net is not None:
+        ploss = net.ping([net.get(h) for h in [topo.origin] + topo.edge_servers], timeout='300ms')
         if ploss > 99.0:
             logging.critical(f'No connectivity between nodes (ploss: {ploss})')
             sys.exit(1)
 
-        net.pingFull([net.get(h) for h in ['origin', 'e1', 'e2']],  timeout='300ms')
+        net.pingFull([net.get(h) for h in [topo.origin] + topo.edge_servers[:2]],  timeout='300ms')
+
+    current_active_hosts = 0
+    logging.info(json.dumps({'type': 'Update', 'time': time.time_ns(), 'active_clients': current_active_hosts}))
+    if search == 'slo':
+        logging.info(f'Searching the capacity of {api} in mode {mode} for p99 <= {slo_p99}ms and error rate <= {slo_error_rate}')
+        capacity = search_capacity(topo, net, api, mode, log_dir, stats, scale_size, scale_interval, maximum_clients, slo_p99, slo_error_rate, search_resolution)
+        logging.info(f'Maximum sustainable load of {api} in mode {mode}: {capacity.active_clients} clients, {capacity.throughput:.1f} requests/s')
+        current_active_hosts = len(topo.client_processes)
+    else:
+        topo.prewarm_clients(net, current_active_hosts, scale_size, log_dir)
+    while search == 'schedule' and current_active_hosts < scale_times * scale_size:
+        logging.info(f'Scaling up clients from {current_active_hosts} to {current_active_hosts + scale_size}')
+        scale_time = time.time_ns()
+        for hi in range(scale_size):
+            topo.start_client(net, current_active_hosts, api, mode, log_dir, stats, scale_time=scale_time)
+            current_active_hosts += 1
+            logging.info(json.dumps({ 'type': 'Update', 'time': time.time_ns(), 'active_clients': current_active_hosts }))
+        topo.prewarm_clients(net, current_active_hosts, scale_size, log_dir)
+        time.sleep(scale_interval)
+
+    if link_recorder is not None:
+        link_recorder.stop()
+    if topo.resource_sampler is not None:
+        topo.resource_sampler.stop()
+        topo.resource_sampler = None
+
+    topo.stop()
+    logging.info(json.dumps({'type': 'Update', 'time': time.time_ns(), 'active_clients': current_active_hosts+1}))
+    time.sleep(1)
+
+    # Marks the experiment as complete, the orchestrator only repeats experiments without it
+    (log_dir / COMPLETE_MARKER).write_text(json.dumps({'api': api, 'mode': mode, 'start': experiment_start, 'end': time.time_ns(), 'partition': topo.partition}))
+
+
+@click.command()
+@click.option('--api', type=click.Choice(['flights', 'forums']), required=True)
+@click.option('--mode', 'modes', type=click.Choice(['proxy', 'cache', 'ttl', 'crdt', 'revalidate']), required=True, multiple=True,
+              help='Several modes run one after another on the same network, each one logs into its own sub directory of --log-dir')
+@click.option('--scale-interval', type=click.IntRange(min=0), default=5)
+@click.option('--scale-size', type=click.IntRange(min=1), default=1)
+@click.option('--scale-times', type=click.IntRange(min=1), default=500)
+@click.option('--log-dir', type=click.Path(file_okay=False, dir_okay=True), required=True)
+@click.option('--stats', type=bool, default=False)
+@click.option('--stats-interval', type=click.FloatRange(min=0, min_open=True), default=1.0, help='Seconds between two samples of the process resources')
+@click.option('--link-interval', type=click.FloatRange(min=0, min_open=True), default=0.1, help='Seconds between two samples of the link traffic')
+@click.option('--search', type=click.Choice(['schedule', 'slo']), default='schedule', help='Scale clients on a fixed schedule or search the maximum load that meets the SLO')
+@click.option('--slo-p99', type=click.FloatRange(min=0, min_open=True), default=100.0, help='p99 latency bound in ms for --search slo')
+@click.option('--slo-error-rate', type=click.FloatRange(min=0, max=1), default=0.01, help='Error rate bound for --search slo')
+@click.option('--search-resolution', type=click.IntRange(min=1), default=1, help='Stop bisecting once the knee is known to this many clients')
+@click.option('--startup-timeout', type=click.FloatRange(min=0, min_open=True), default=30.0, help='Seconds the origin and each edge server have to become ready')
+@click.option('--launcher', type=click.Choice(['zygote', 'popen']), default='zygote', help='Fork clients from pre-warmed zygotes or start a new interpreter for each one')
+@click.option('--backend', type=click.Choice(['mininet', 'local']), default='mininet', help='Emulate the network with Mininet or run all processes locally behind latency relays')
+@click.option('--base-port', type=click.IntRange(min=1, max=65000), default=20000, help='First loopback port of the origin and edge servers with --backend local')
+@click.option('--bandwidth', type=click.FloatRange(min=0, min_open=True), required=False, help='Bandwidth cap of every link in Mbit/s with --backend local')
+@click.option('--phase-timing', is_flag=True, default=False, help='Clients log connect, ttfb, transfer, decode and think time of every request')
+@click.option('--hosts-per-class', type=click.IntRange(min=1), required=False,
+              help='Share a pool of this many client hosts per edge and distance class among all clients instead of one host per client')
+@click.option('--distance-classes', type=click.IntRange(min=1), default=5, help='Distance classes of the client host pool, each with the link delay of its center')
+@click.option('--partition', type=click.IntRange(min=0), required=False, help='Index of this run when several topologies run concurrently on one machine')
+@click.option('--cores', type=str, callback=parse_cores, required=False, help='Core range like 2-17 the topology is pinned to, defaults to all but the first two cores')
+def main(api: str, modes: list[str], scale_interval: int, scale_size: int, scale_times: int, log_dir: Path, stats: bool, stats_interval: float, link_interval: float,
+         search: str, slo_p99: float, slo_error_rate: float, search_resolution: int, startup_timeout: float, launcher: str, backend: str, base_port: int, bandwidth: float, phase_timing: bool,
+         hosts_per_class: int, distance_classes: int, partition: int, cores: range):
+    if search == 'slo' and scale_interval == 0:
+        raise click.BadParameter('--search slo measures each load for --scale-interval seconds, it must be positive', param_hint='--scale-interval')
+    log_dir = Path(log_dir)
+    log_dir.mkdir(exist_ok=True, parents=True)
+
 
-        current_active_hosts = 0
-        logging.info(json.dumps({'type': 'Update', 'time': time.time_ns(), 'active_clients': current_active_hosts}))
-        while current_active_hosts < scale_times * scale_size:
-            logging.info(f'Scaling up clients from {current_active_hosts} to {current_active_hosts + scale_size}')
-            for hi in range(scale_size):
-                topo.start_client(net, current_active_hosts, api, mode, log_dir, stats)
-                current_active_hosts += 1
-                logging.info(json.dumps({ 'type': 'Update', 'time': time.time_ns(), 'active_clients': current_active_hosts }))
-            time.sleep(scale_interval)
+    logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(), logging.FileHandler(log_dir / ('mininet.log' if len(modes) == 1 else 'topology.log'), errors='backslashreplace')])
 
-        global logging_active
-        logging_active = False
+    maximum_clients = scale_times * scale_size
+
+    if backend == 'local':
+        if hosts_per_class is not None:
+            raise click.BadParameter('local clients have no hosts to share, it needs --backend mininet', param_hint='--hosts-per-class')
+        logging.info(f'Creating local topology on ports from {base_port}')
+        topo = LocalTopology(num_clients=maximum_clients, launcher=launcher, base_port=base_port, bandwidth=bandwidth * 10**6 if bandwidth else None)
+        net = None
+    else:
+        if Mininet is None:
+            raise click.UsageError('Mininet is not installed, use --backend local')
+        topo = OriginEdgeTopology(num_clients=maximum_clients, partition=partition, cores=cores, launcher=launcher, hosts_per_class=hosts_per_class,
+                                  distance_classes=distance_classes)
+
+        logging.info(f'Creating Mininet Topology')
+        net_params = {} if partition is None else {'controller': partial(Controller, port=6653 + partition)}
+        net = Mininet(topo=topo, autoPinCpus=False, host=CPULimitedHost, cleanup=True, **net_params)
+        logging.info(f'Starting Mininet')
+
+    if phase_timing:
+        topo.client_options.append('--phase-timing')
 
-        topo.stop()
-        logging.info(json.dumps({'type': 'Update', 'time': time.time_ns(), 'active_clients': current_active_hosts+1}))
-        time.sleep(1)
+    try:
+        if net is not None:
+            net.start()
+
+        for mode in modes:
+            if len(modes) == 1:
+                run_experiment(topo, net, api, mode, log_dir, scale_interval, scale_size, scale_times, stats, stats_interval, link_interval,
+                               search, slo_p99, slo_error_rate, search_resolution, startup_timeout)
+                continue
+
+            mode_log_dir = log_dir / mode
+            mode_log_dir.mkdir(exist_ok=True)
+            mode_log_handler = logging.FileHandler(mode_log_dir / 'mininet.log', errors='backslashreplace')
+            logging.getLogger().addHandler(mode_log_handler)
+            try:
+                run_experiment(topo, net, api, mode, mode_log_dir, scale_interval, scale_size, scale_times, stats, stats_interval, link_interval,
+                               search, slo_p99, slo_error_rate, search_resolution, startup_timeout)
+            finally:
+                logging.getLogger().removeHandler(mode_log_handler)
+                mode_log_handler.close()
 
 
     finally:
-        net.stop()
+        if net is not None:
+            net.stop()
+        else:
+            topo.close()
 
 
 topos = {'oetopo': (lambda: OriginEdgeTopology())}
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import json
+import logging
+import multiprocessing
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+
+import click
+
+REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+MAIN_BIN = REPOSITORY_DIR / 'mininet' / 'main.py'
+# origin, five edge servers with two cores each and at least one core for the clients
+MIN_CORES_PER_RUN = 12
+# Written by main.py into the log directory of every experiment that ran to the end
+COMPLETE_MARKER = 'experiment.json'
+
+
+def load_matrix(matrix_file: Path) -> tuple[list[str], list[str], list[str]]:
+    """Reads a matrix like {"apis": ["flights"], "modes": ["crdt", "proxy"], "args": {"scale-size": 1, "stats": false}}."""
+    matrix = json.loads(matrix_file.read_text())
+    args = []
+    for option, value in matrix.get('args', {}).items():
+        args += [f'--{option}', f'{value}']
+    return matrix['apis'], matrix['modes'], args
+
+
+def cell_dir(out_dir: Path, api: str, mode: str) -> Path:
+    return out_dir / api / mode
+
+
+def is_complete(out_dir: Path, api: str, mode: str) -> bool:
+    return (cell_dir(out_dir, api, mode) / COMPLETE_MARKER).exists()
+
+
+def core_partitions(cores_per_run: int, parallel: int = None) -> list[range]:
+    # The first two cores stay with the system like in a single run
+    first_core, num_cores = 2, multiprocessing.cpu_count()
+    partitions = [range(start, start + cores_per_run) for start in range(first_core, num_cores - cores_per_run + 1, cores_per_run)]
+    if not partitions:
+        raise click.UsageError(f'{num_cores} cores are not enough for a run with {cores_per_run} cores')
+    return partitions[:parallel]
+
+
+def group_cells(apis: list[str], modes: list[str], out_dir: Path, modes_per_topology: int, resume: bool) -> list[tuple[str, list[str]]]:
+    """Groups the pending cells into runs, the modes of one run share a network that is only built once."""
+    groups = []
+    for api in apis:
+        pending = [mode for mode in modes if not (resume and is_complete(out_dir, api, mode))]
+        for i in range(0, len(pending), modes_per_topology):
+            groups.append((api, pending[i:i + modes_per_topology]))
+    return groups
+
+
+def run_group(api: str, modes: list[str], out_dir: Path, args: list[str], partitions: Queue) -> tuple[str, list[str], int, float]:
+    partition, cores = partitions.get()
+    try:
+        log_dir = cell_dir(out_dir, api, modes[0]) if len(modes) == 1 else out_dir / api
+        log_dir.mkdir(parents=True, exist_ok=True)
+        command = [sys.executable, str(MAIN_BIN), '--api', api, '--log-dir', str(log_dir), '--partition', f'{partition}', '--cores', f'{cores.start}-{cores.stop - 1}']
+        command += [arg for mode in modes for arg in ['--mode', mode]] + args
+        logging.info(f'Starting {api} {",".join(modes)} on partition {partition} (cores {cores.start}-{cores.stop - 1})')
+        start = time.monotonic()
+        with (log_dir / f'orchestrator_{"_".join(modes)}.log').open(mode='w') as run_log:
+            result = subprocess.run(command, cwd=REPOSITORY_DIR, stdout=run_log, stderr=subprocess.STDOUT)
+        return api, modes, result.returncode, time.monotonic() - start
+    finally:
+        partitions.put((partition, cores))
+
+
+@click.command()
+@click.argument('matrix_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--out-dir', type=click.Path(file_okay=False, dir_okay=True), required=True)
+@click.option('--cores-per-run', type=click.IntRange(min=MIN_CORES_PER_RUN), default=16, help='Size of the disjoint core partition of each concurrent run')
+@click.option('--parallel', type=click.IntRange(min=1), required=False, help='Maximum concurrent runs, defaults to as many as the cores allow')
+@click.option('--modes-per-topology', type=click.IntRange(min=1), default=2, help='Modes of one api that run one after another on the same network')
+@click.option('--resume/--no-resume', default=True, help='Skip the cells that already completed in a previous run of the matrix')
+def main(matrix_file: str, out_dir: str, cores_per_run: int, parallel: int, modes_per_topology: int, resume: bool):
+    """Runs the api x mode matrix of MATRIX_FILE, independent runs execute concurrently on disjoint core partitions."""
+    logging.basicConfig(level=logging.INFO)
+    out_dir = Path(out_dir).absolute()
+    apis, modes, args = load_matrix(Path(matrix_file))
+
+    groups = group_cells(apis, modes, out_dir, modes_per_topology, resume)
+    skipped = len(apis) * len(modes) - sum(len(group_modes) for _, group_modes in groups)
+    if skipped > 0:
+        logging.info(f'Skipping {skipped} completed cells')
+
+    partitions: Queue = Queue()
+    for partition in enumerate(core_partitions(cores_per_run, parallel)):
+        partitions.put(partition)
+    logging.info(f'Running {len(groups)} runs on {partitions.qsize()} partitions')
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=partitions.qsize()) as executor:
+        futures = [executor.submit(run_group, api, group_modes, out_dir, args, partitions) for api, group_modes in groups]
+        for future in futures:
+            api, group_modes, returncode, duration = future.result()
+            logging.info(f'Finished {api} {",".join(group_modes)} with exit code {returncode} after {duration:.0f}s')
+
+    failed = [f'{api}/{mode}' for api in apis for mode in modes if not is_complete(out_dir, api, mode)]
+    logging.info(f'Matrix finished after {time.monotonic() - start:.0f}s')
+    if failed:
+        logging.error(f'Failed cells, run again to resume them: {", ".join(failed)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
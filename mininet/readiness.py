@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import socket
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import click
+
+
+def http_ready(url: str, timeout: float) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status < 500
+    except urllib.error.HTTPError as e:
+        return e.code < 500
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def redis_ready(address: str, timeout: float) -> bool:
+    host, _, port = address.rpartition(':')
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout) as connection:
+            connection.sendall(b'PING\r\n')
+            return connection.recv(64).startswith(b'+PONG')
+    except OSError:
+        return False
+
+
+@click.command()
+@click.option('--http', 'http_urls', multiple=True, help='URL that has to answer without a server error')
+@click.option('--redis', 'redis_addresses', multiple=True, help='host:port of a Redis server that has to answer PING')
+@click.option('--timeout', type=click.FloatRange(min=0), default=30.0, help='Seconds until the component counts as failed')
+@click.option('--interval', type=click.FloatRange(min=0, min_open=True), default=0.05, help='Seconds between two probes')
+def main(http_urls: list[str], redis_addresses: list[str], timeout: float, interval: float):
+    """Probes the given components until all of them are ready, exits with 1 if they are not ready within the timeout."""
+    deadline = time.monotonic() + timeout
+    pending = [(http_ready, url) for url in http_urls] + [(redis_ready, address) for address in redis_addresses]
+    while pending:
+        pending = [(probe, target) for probe, target in pending if not probe(target, max(interval, 1.0))]
+        if not pending:
+            break
+        if time.monotonic() >= deadline:
+            print(f'Not ready after {timeout}s: {", ".join(target for _, target in pending)}', file=sys.stderr)
+            sys.exit(1)
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    main()